@@ -1,16 +1,85 @@
 # Importing required libraries
+import io
+import os
+import uuid
+
 import numpy as np
 import pandas as pd
-import seaborn as sns
-import matplotlib.pyplot as plt
-import openpyxl
 import plotly.express as px
 import streamlit as st
 
-# Function to load default data
-@st.cache_data
-def load_default_data():
-    return pd.read_excel("superstore.xlsx", engine='openpyxl')
+from superstore import analytics, spans
+from superstore.cache import cache_dir_for, load_cached_source, source_signature
+from superstore.dataset import Dataset
+from superstore.figures import FigureCache, downsample, render_mode
+from superstore.ingest import UploadCache
+from superstore.outofcore import open_store, store_key
+from superstore.tables import EXPORT_FORMATS, PagedTable, export_bytes
+from superstore.warmup import DEFAULT_RANGE, WarmupScheduler
+
+# Upper bound on the memory held by parsed uploads, shared by all sessions
+UPLOAD_CACHE_BYTES = 2 * 1024 ** 3
+
+# Uploads larger than this are streamed into an on-disk store instead of being parsed into memory.
+# It has to stay below Streamlit's server.maxUploadSize (200 MB by default), or no upload reaches it.
+OUT_OF_CORE_BYTES = 64 * 1024 ** 2
+
+# Disk space for those stores; the least recently used ones are deleted beyond it
+OUT_OF_CORE_DISK_BYTES = 20 * 1024 ** 3
+
+# Number of serialized figures kept across reruns and sessions
+FIGURE_CACHE_ENTRIES = 512
+
+# Threads precomputing every page's default view in the background
+WARMUP_WORKERS = 2
+
+# Rows per page of a paginated table
+TABLE_PAGE_SIZE = 50
+
+# Default dataset: the bundled workbook, or an .xlsx/.csv/.parquet export named by $SUPERSTORE_DATA
+DEFAULT_SOURCE = os.environ.get("SUPERSTORE_DATA", "superstore.xlsx")
+
+# Function to load default data (memory-mapped from the columnar sidecar after the first parse).
+# The normalized dataset is shared by all sessions, and its pages by all worker processes, instead
+# of being copied into each one. Keyed by the file's size and mtime, so replacing the file
+# swaps every new rerun over to the refreshed data; runs already in progress keep the old mapping.
+@st.cache_resource(max_entries=1)
+def load_default_data(path, signature):
+    frame, digest = load_cached_source(path)
+    return Dataset(frame, key=digest)
+
+# A store kept up to date with `python -m superstore.outofcore --append` can replace the default
+# dataset; it is reopened whenever an append changes its key, and only the latest version is kept open
+STORE_ENV = "SUPERSTORE_STORE"
+
+@st.cache_resource(max_entries=1)
+def load_store(root, key):
+    return open_store(root)
+
+# Serialized Plotly figures shared by all sessions
+@st.cache_resource
+def get_figure_cache():
+    return FigureCache(max_entries=FIGURE_CACHE_ENTRIES)
+
+# Parsed uploads keyed by content digest, so reruns and identical files are not re-parsed
+@st.cache_resource
+def get_upload_cache():
+    return UploadCache(max_bytes=UPLOAD_CACHE_BYTES, spill_bytes=OUT_OF_CORE_BYTES,
+                       spill_dir=os.path.join(cache_dir_for(DEFAULT_SOURCE), "outofcore"),
+                       spill_max_bytes=OUT_OF_CORE_DISK_BYTES)
+
+# Per-rerun span timings: shown in the sidebar when "Show timings" is ticked (which also traces
+# peak memory), and appended as JSON lines to $SUPERSTORE_SPAN_LOG when that is set. A rerun that
+# ended early (st.stop() or a widget change) never finished its trace, so release it here.
+if "trace" in st.session_state:
+    st.session_state.trace.release()
+trace = st.session_state.trace = spans.start(memory=st.session_state.get("show_timings", False))
+
+# Background warm-up of each page's default filters, once per dataset; a dataset's warm-up is
+# cancelled when no session uses it any more
+@st.cache_resource
+def get_warmup_scheduler():
+    return WarmupScheduler(max_workers=WARMUP_WORKERS)
 
 # Sidebar for file upload or default dataset
 st.sidebar.title("Upload or Load Dataset")
@@ -22,23 +91,37 @@ data_source = st.sidebar.radio(
 
 # Load dataset based on user input
 if data_source == "Default Dataset":
-    df = load_default_data()
+    store_root = os.environ.get(STORE_ENV)
+    key = store_key(store_root) if store_root else None
+    dataset = load_store(store_root, key) if key else load_default_data(DEFAULT_SOURCE, source_signature(DEFAULT_SOURCE))
     st.sidebar.success("Default dataset loaded successfully!")
 else:
-    uploaded_file = st.sidebar.file_uploader("Upload an Excel file", type=['xlsx'])
+    uploaded_file = st.sidebar.file_uploader("Upload an Excel, CSV or Parquet file", type=['xlsx', 'csv', 'parquet'])
     if uploaded_file is not None:
-        df = pd.read_excel(uploaded_file, engine='openpyxl')
+        progress_bar = st.sidebar.empty()
+
+        def show_progress(fraction):
+            progress_bar.progress(fraction, text="Parsing file...")
+
+        # The digest of the session's current upload is remembered by file id, so later reruns find the
+        # cached dataset without copying the payload out of the uploader or hashing it again
+        upload_cache = get_upload_cache()
+        upload = st.session_state.get("upload_digest")
+        digest = upload[1] if upload is not None and upload[0] == uploaded_file.file_id else None
+        dataset = upload_cache.get(digest) if digest is not None else None
+        if dataset is None:
+            fmt = os.path.splitext(uploaded_file.name)[1]
+            dataset = upload_cache.get_or_parse(uploaded_file.getvalue(), fmt=fmt, progress=show_progress,
+                                                digest=digest)
+            st.session_state.upload_digest = (uploaded_file.file_id, dataset.key)
+        progress_bar.empty()
         st.sidebar.success("Dataset uploaded successfully!")
     else:
         st.sidebar.warning("Please upload a dataset to proceed.")
         st.stop()  # Stop execution if no file is uploaded
 
-# Convert order_date to datetime
-df['order_date'] = pd.to_datetime(df['order_date'])
-
-# Extract year and week from the order_date
-df['year'] = df['order_date'].dt.year
-df['week'] = df['order_date'].dt.isocalendar().week
+session_id = st.session_state.setdefault("session_id", uuid.uuid4().hex)
+warmup = get_warmup_scheduler().warm(dataset, session=session_id)
 
 # CSS for customization
 st.markdown('<h1 class="title">Superstore Sales Analysis Report</h1>', unsafe_allow_html=True)
@@ -115,10 +198,48 @@ elif page == "Advanced Analysis":
     subpage = st.sidebar.radio("Select Advanced Analysis Page", [
         "Product Performance",
         "State-wise Performance",
-        # "Sales Trends by Seasonality",
+        "Sales Trends by Seasonality",
         "Correlation Analysis"
     ])
 
+trace.page = subpage
+
+# Builders run only on a figure cache miss; each run is recorded as a figure_build span
+def traced_build(key, build):
+    def run():
+        with spans.span("figure_build", detail=key[0], filters=repr(tuple(key[1:]))):
+            return build()
+    return run
+
+# Figures are cached per dataset, page and filter state and reused across reruns and sessions
+def show_figure(key, build):
+    figure = get_figure_cache().figure((dataset.key, subpage) + tuple(key), traced_build(key, build))
+    with spans.span("plotly_chart", detail=key[0], filters=repr(tuple(key[1:]))):
+        st.plotly_chart(figure)
+
+# Tables are paginated server-side: only the visible page is sent to the browser, and longer tables get
+# sort and page controls. Every table can be exported as CSV or Parquet; the file is written in chunks
+# only when the button is clicked.
+def show_table(key, frame, columns=None):
+    table = PagedTable(frame, columns)
+    by, ascending, number = None, True, 0
+    pages = table.page_count(TABLE_PAGE_SIZE)
+    if pages > 1:
+        sort_column, order_column, page_column = st.columns(3)
+        by = sort_column.selectbox("Sort by", ["(original order)"] + table.columns, key=f"{key}_sort")
+        by = None if by == "(original order)" else by
+        ascending = not order_column.checkbox("Descending", key=f"{key}_descending")
+        # Keyed by the page count, so the page resets to 1 when the filters change the table's length
+        number = page_column.number_input("Page", min_value=1, max_value=pages, value=1, step=1,
+                                          key=f"{key}_page_{pages}") - 1
+        st.caption(f"Rows {number * TABLE_PAGE_SIZE + 1:,}-{min((number + 1) * TABLE_PAGE_SIZE, len(table)):,} "
+                   f"of {len(table):,}")
+    st.dataframe(table.page(number, TABLE_PAGE_SIZE, by, ascending))
+    for column, fmt in zip(st.columns(len(EXPORT_FORMATS)), EXPORT_FORMATS):
+        column.download_button(f"Export {fmt.upper()}", data=lambda fmt=fmt: export_bytes(table, fmt, by, ascending),
+                               file_name=f"{key}.{fmt}", mime=EXPORT_FORMATS[fmt], key=f"{key}_{fmt}",
+                               on_click="ignore")
+
 # Render the selected subpage
 if subpage == "Regional Performance Analysis":
     st.header("Regional Performance Analysis")
@@ -127,197 +248,210 @@ if subpage == "Regional Performance Analysis":
     st.subheader("Total Sales by Region")
     
     # Aggregate total sales by region
-    total_sales_by_region = df.groupby('region')['sales'].sum().reset_index()
+    total_sales_by_region = analytics.sales_by_region(dataset)
     
     # Create a Plotly bar chart for total sales by region
-    fig1 = px.bar(total_sales_by_region, 
-                  x='region', 
-                  y='sales', 
-                  title='Total Sales by Region',
-                  labels={'region': 'Region', 'sales': 'Total Sales'},
-                  color='region',  # Color by region for better distinction
-                  color_discrete_sequence=px.colors.qualitative.T10)
+    def build_sales_by_region():
+        fig1 = px.bar(total_sales_by_region, 
+                      x='region', 
+                      y='sales', 
+                      title='Total Sales by Region',
+                      labels={'region': 'Region', 'sales': 'Total Sales'},
+                      color='region',  # Color by region for better distinction
+                      color_discrete_sequence=px.colors.qualitative.T10)
     
-    # Customize layout
-    fig1.update_layout(xaxis_title='Region', 
-                       yaxis_title='Total Sales',
-                       title_x=0.5, 
-                       template='plotly_white',
-                       width=700, 
-                       height=500)
+        # Customize layout
+        fig1.update_layout(xaxis_title='Region', 
+                           yaxis_title='Total Sales',
+                           title_x=0.5, 
+                           template='plotly_white',
+                           width=700, 
+                           height=500)
+        return fig1
     
     # Display the plot in Streamlit
-    st.plotly_chart(fig1)
+    show_figure(('sales_by_region',), build_sales_by_region)
 
     # Second Plot: Average Profit Margin by Region
     st.subheader("Average Profit Margin by Region")
     
     # Calculate average profit margin by region
-    avg_profit_margin_by_region = df.groupby('region')['profit_margin'].mean().reset_index()
+    avg_profit_margin_by_region = analytics.margin_by_region(dataset)
     
     # Create a Plotly bar chart for average profit margin by region
-    fig2 = px.bar(avg_profit_margin_by_region, 
-                  x='region', 
-                  y='profit_margin', 
-                  title='Average Profit Margin by Region',
-                  labels={'region': 'Region', 'profit_margin': 'Average Profit Margin'},
-                  color='region',  # Color by region for better distinction
-                  color_discrete_sequence=px.colors.qualitative.T10)
+    def build_margin_by_region():
+        fig2 = px.bar(avg_profit_margin_by_region, 
+                      x='region', 
+                      y='profit_margin', 
+                      title='Average Profit Margin by Region',
+                      labels={'region': 'Region', 'profit_margin': 'Average Profit Margin'},
+                      color='region',  # Color by region for better distinction
+                      color_discrete_sequence=px.colors.qualitative.T10)
     
-    # Customize layout
-    fig2.update_layout(xaxis_title='Region', 
-                       yaxis_title='Average Profit Margin',
-                       title_x=0.5, 
-                       template='plotly_white',
-                       width=700, 
-                       height=500)
+        # Customize layout
+        fig2.update_layout(xaxis_title='Region', 
+                           yaxis_title='Average Profit Margin',
+                           title_x=0.5, 
+                           template='plotly_white',
+                           width=700, 
+                           height=500)
+        return fig2
     
     # Display the plot in Streamlit
-    st.plotly_chart(fig2)
+    show_figure(('margin_by_region',), build_margin_by_region)
 
 elif subpage == "Product Category Analysis":
     st.header("Product Category Analysis")
 
     # Date filter at the top
-    min_date = df['order_date'].min()
-    max_date = df['order_date'].max()
+    min_date = dataset.dates.min_date
+    max_date = dataset.dates.max_date
     start_date = st.date_input("Start Date", value=min_date)
     end_date = st.date_input("End Date", value=max_date)
 
-    # Ensure 'order_date' is in datetime format
-    df['order_date'] = pd.to_datetime(df['order_date'])
-    
-    # Filter data based on the date range
-    df_filtered = df[(df['order_date'] >= pd.to_datetime(start_date)) & (df['order_date'] <= pd.to_datetime(end_date))]
-
     # Region filter (optional)
-    region_options = ["All Regions"] + list(df['region'].unique())
+    region_options = ["All Regions"] + dataset.distinct('region')
     selected_region = st.selectbox("Select Region", options=region_options, index=0)
 
-    # Filter data based on the selected region (default to all regions if "All Regions" is selected)
-    if selected_region != "All Regions":
-        df_filtered = df_filtered[df_filtered['region'] == selected_region]
-
     # Category filter
-    selected_category = st.selectbox("Select Category", options=df['category'].unique(), index=0)
+    selected_category = st.selectbox("Select Category", options=dataset.distinct('category'), index=0)
 
-    # Filter data based on the selected category
-    category_sales = df_filtered[df_filtered['category'] == selected_category].groupby('subcategory')[['sales', 'profit']].sum().reset_index().sort_values(by='sales', ascending=False)
+    # Subcategory totals for the date range, region (default to all regions if "All Regions" is selected) and category
+    category_sales = analytics.category_sales(dataset, selected_category, start_date, end_date,
+                                              region=None if selected_region == "All Regions" else selected_region)
 
     # Display the sales by subcategory
     st.write(f"### Category: {selected_category} - Subcategories Sales and Profit (in {selected_region if selected_region != 'All Regions' else 'All Regions'})")
-    st.dataframe(category_sales)
+    show_table("category_sales", category_sales)
 
     # Plot sales and profit by subcategory
-    fig2 = px.bar(category_sales, 
-                  x='subcategory', 
-                  y=['sales', 'profit'], 
-                  title=f'Sales and Profit for {selected_category} in {selected_region if selected_region != "All Regions" else "All Regions"}', 
-                  barmode='group',
-                  labels={'sales': 'Total Sales', 'profit': 'Total Profit', 'subcategory': 'Subcategory'})
-
-    # Update hover template for each trace
-    fig2.for_each_trace(lambda t: t.update(hovertemplate=f'<b>{t.name}</b><br>Amount: %{t.y[0]:,.2f}<extra></extra>'))
-
-    # Customize layout
-    fig2.update_layout(xaxis_title="Subcategory", 
-                       yaxis_title="Amount", 
-                       title_x=0.5,
-                       template='plotly_white')
+    def build_category_sales():
+        fig2 = px.bar(category_sales, 
+                      x='subcategory', 
+                      y=['sales', 'profit'], 
+                      title=f'Sales and Profit for {selected_category} in {selected_region if selected_region != "All Regions" else "All Regions"}', 
+                      barmode='group',
+                      labels={'sales': 'Total Sales', 'profit': 'Total Profit', 'subcategory': 'Subcategory'})
+
+        # Update hover template for each trace
+        fig2.for_each_trace(lambda t: t.update(hovertemplate=f'<b>{t.name}</b><br>Amount: %{t.y[0]:,.2f}<extra></extra>'))
+
+        # Customize layout
+        fig2.update_layout(xaxis_title="Subcategory", 
+                           yaxis_title="Amount", 
+                           title_x=0.5,
+                           template='plotly_white')
+        return fig2
 
     # Display the plot
-    st.plotly_chart(fig2)
+    show_figure(('subcategory_sales', start_date, end_date, selected_region, selected_category), build_category_sales)
 
 # Customer Sales Analytics Page
 elif subpage == "Customer Sales Analytics":
     st.header("Customer Sales Analytics")
 
     # Show Total Number of Customers
-    total_customers = df['customer'].nunique()
+    total_customers = analytics.customer_count(dataset)
     st.subheader(f"Total Number of Customers: {total_customers}")
 
     # Display top 5 customers by profit
     st.subheader("Top 5 Customers by Profit")
-    top_customers = df.groupby('customer')['profit'].sum().nlargest(5).reset_index()
-    st.dataframe(top_customers)
+    top_customers = analytics.top_customers(dataset, 5, 'profit')
+    show_table("top_customers", top_customers)
 
     # Add date filter
     st.subheader("Filter by Date")
-    start_date = st.date_input("Start Date", pd.to_datetime("2019-01-01"))
-    end_date = st.date_input("End Date", pd.to_datetime("2020-12-31"))
+    start_date = st.date_input("Start Date", DEFAULT_RANGE[0])
+    end_date = st.date_input("End Date", DEFAULT_RANGE[1])
 
     # Convert to datetime if necessary
     start_date = pd.to_datetime(start_date)
     end_date = pd.to_datetime(end_date)
 
-    # Filter dataset by date range
-    mask = (df['order_date'] >= start_date) & (df['order_date'] <= end_date)
-    filtered_data = df.loc[mask].copy()  # Ensure a copy of the filtered data
-
-    if filtered_data.empty:
+    # Distinct customers and products in the date range, merged from per-day/region/category
+    # HyperLogLog sketches (within about 3% of the true counts) unless exact counts are requested
+    st.subheader("Distinct Customers and Products")
+    count_region = st.selectbox("Select Region", options=["All Regions"] + dataset.distinct('region'), index=0)
+    count_category = st.selectbox("Select Category", options=["All Categories"] + dataset.distinct('category'), index=0)
+    exact_counts = st.checkbox("Exact counts (slower on large datasets)", value=False)
+    region = None if count_region == "All Regions" else count_region
+    category = None if count_category == "All Categories" else count_category
+    for column, (label, name) in zip(st.columns(2), [("Customers", "customer"), ("Products", "product_name")]):
+        count = analytics.distinct_count(dataset, name, start_date, end_date, region=region, category=category,
+                                         exact=exact_counts)
+        column.metric(label if exact_counts else f"{label} (approx.)", f"{count:,}" if exact_counts else f"~{count:,}")
+
+    # Customers with orders in the date range
+    customer_options = analytics.customers_between(dataset, start_date, end_date)
+
+    if not customer_options:
         st.warning("No data available for the selected date range.")
     else:
-        # Select a customer to filter data
-        selected_customer = st.selectbox("Select Customer", options=filtered_data['customer'].unique())
-        customer_data = filtered_data.loc[filtered_data['customer'] == selected_customer].copy()
+        # Select a customer and look up their rows in the date range
+        selected_customer = st.selectbox("Select Customer", options=customer_options)
+        customer_data = analytics.customer_purchases(dataset, selected_customer, start_date, end_date)
 
         st.subheader(f"Sales for Customer: {selected_customer}")
 
         # Display table for customer purchase details
         st.write("Purchase Details")
-        st.dataframe(customer_data[['order_date', 'product_name', 'sales', 'quantity']])
+        show_table("purchase_details", customer_data, ['order_date', 'product_name', 'sales', 'quantity'])
 
         # Visualize sales by product for this customer
-        product_sales = customer_data.groupby('product_name')['sales'].sum().reset_index()
-        fig = px.bar(product_sales, y='product_name', x='sales', title=f'Sales by Product for {selected_customer}')
-        st.plotly_chart(fig)
+        product_sales = analytics.customer_product_sales(customer_data)
+        def build_customer_products():
+            fig = px.bar(product_sales, y='product_name', x='sales', title=f'Sales by Product for {selected_customer}')
+            return fig
+        show_figure(('customer_products', start_date, end_date, selected_customer), build_customer_products)
 
         # Visualize purchase history over time for this customer
-        sales_over_time = customer_data.groupby('order_date')['sales'].sum().reset_index()
-        fig = px.line(sales_over_time, x='order_date', y='sales', title=f'Sales Over Time for {selected_customer}', markers=True)
-        st.plotly_chart(fig)
+        sales_over_time = analytics.customer_sales_over_time(customer_data)
+        def build_customer_sales_over_time():
+            # Long histories are downsampled (LTTB) and drawn with WebGL to keep the payload small
+            points = downsample(sales_over_time, 'order_date', 'sales')
+            fig = px.line(points, x='order_date', y='sales', title=f'Sales Over Time for {selected_customer}', markers=True,
+                          render_mode=render_mode(len(points)))
+            return fig
+        show_figure(('customer_sales_over_time', start_date, end_date, selected_customer), build_customer_sales_over_time)
 
 
 elif subpage == "Profit Analytics":
     st.header("Profit Analytics")
     
     # Display total profit across all regions by default
-    total_profit = df['profit'].sum()
+    total_profit = analytics.total_profit(dataset)
     st.write(f"**Total Profit Across All Regions:** ${total_profit:,.2f}")
 
     # Add date filter
     st.subheader("Select Date Range")
-    start_date = st.date_input("From", df['order_date'].min().date())
-    end_date = st.date_input("To", df['order_date'].max().date())
-
-    # Filter the dataset based on the selected date range
-    filtered_df = df[(df['order_date'] >= pd.to_datetime(start_date)) & (df['order_date'] <= pd.to_datetime(end_date))]
+    start_date = st.date_input("From", dataset.dates.min_date.date())
+    end_date = st.date_input("To", dataset.dates.max_date.date())
 
     # Filter for region selection
-    selected_profit_region = st.selectbox("Select Region", options=["All"] + list(filtered_df['region'].unique()))
+    selected_profit_region = st.selectbox("Select Region", options=["All"] + analytics.regions_between(dataset, start_date, end_date))
     
     if selected_profit_region == "All":
-        region_profit = filtered_df.groupby('region')['profit'].sum().reset_index()
+        region_profit = analytics.profit_by_region(dataset, start_date, end_date)
         st.write(f"**Total Profit for Selected Date Range:** ${region_profit['profit'].sum():,.2f}")
     else:
-        region_profit = filtered_df[filtered_df['region'] == selected_profit_region].groupby('region')['profit'].sum().reset_index()
+        region_profit = analytics.profit_by_region(dataset, start_date, end_date, region=selected_profit_region)
         st.write(f"**Total Profit for {selected_profit_region} in Selected Date Range:** ${region_profit['profit'].values[0]:,.2f}")
     
-    fig = px.bar(region_profit, x='region', y='profit', title=f'Total Profit in {selected_profit_region if selected_profit_region != "All" else "All Regions"}', color='region')
-    st.plotly_chart(fig)
+    def build_region_profit():
+        fig = px.bar(region_profit, x='region', y='profit', title=f'Total Profit in {selected_profit_region if selected_profit_region != "All" else "All Regions"}', color='region')
+        return fig
+    show_figure(('region_profit', start_date, end_date, selected_profit_region), build_region_profit)
     
     # Add filter for category and subcategory
-    selected_category = st.selectbox("Select Category", options=["All"] + list(filtered_df['category'].unique()))
-    
-    if selected_category == "All":
-        filtered_data = filtered_df
-    else:
-        filtered_data = filtered_df[filtered_df['category'] == selected_category]
+    selected_category = st.selectbox("Select Category", options=["All"] + analytics.categories_between(dataset, start_date, end_date))
     
     st.subheader(f"Profit by Sub-Category in {selected_profit_region if selected_profit_region != 'All' else 'All Regions'} for {selected_category if selected_category != 'All' else 'All Categories'}")
-    subcategory_profit = filtered_data.groupby('subcategory')['profit'].sum().reset_index()
-    fig = px.bar(subcategory_profit, x='subcategory', y='profit', title=f'Profit by Sub-Category in {selected_profit_region if selected_profit_region != "All" else "All Regions"}', color='subcategory')
-    st.plotly_chart(fig)
+    subcategory_profit = analytics.profit_by_subcategory(dataset, start_date, end_date,
+                                                        category=None if selected_category == "All" else selected_category)
+    def build_subcategory_profit():
+        fig = px.bar(subcategory_profit, x='subcategory', y='profit', title=f'Profit by Sub-Category in {selected_profit_region if selected_profit_region != "All" else "All Regions"}', color='subcategory')
+        return fig
+    show_figure(('subcategory_profit', start_date, end_date, selected_profit_region, selected_category), build_subcategory_profit)
 
 
 # Discount Analytics
@@ -325,48 +459,42 @@ elif subpage == "Discount Strategy Analysis":
     st.header("Discount Strategy Analysis")
     st.subheader("Discount Impact on Sales and Profit")
 
-    # Extract Year and Month from 'order_date' column
-    df['order_date'] = pd.to_datetime(df['order_date'])  # Ensure 'order_date' is in datetime format
-
     # Date filter
     st.write("**Select Date Range**")
-    start_date = st.date_input("From", min_value=df['order_date'].min().date(), max_value=df['order_date'].max().date())
-    end_date = st.date_input("To", min_value=start_date, max_value=df['order_date'].max().date())
+    start_date = st.date_input("From", min_value=dataset.dates.min_date.date(), max_value=dataset.dates.max_date.date())
+    end_date = st.date_input("To", min_value=start_date, max_value=dataset.dates.max_date.date())
 
     # Region filter
-    region_options = [None] + list(df['region'].unique())
+    region_options = [None] + dataset.distinct('region')
     selected_region = st.selectbox("Select Region (Optional)", options=region_options)
 
-    # Filter data based on the selected date range and region
-    filtered_df = df[(df['order_date'] >= pd.to_datetime(start_date)) & (df['order_date'] <= pd.to_datetime(end_date))]
-    if selected_region:
-        filtered_df = filtered_df[filtered_df['region'] == selected_region]
-
     # Show overall discount impact (if no filter is applied)
     st.write("### Overall Discount Strategy Impact on Sales and Profit")
-    overall_discount_impact = df.groupby('discount')[['sales', 'profit']].sum().reset_index()
-
-    # Show overall discount impact using a line chart
-    fig_overall = px.line(overall_discount_impact, x='discount', y=['sales', 'profit'],
-                          title="Overall Sales and Profit by Discount",
-                          labels={'sales': 'Total Sales', 'profit': 'Total Profit'},
-                          markers=True)
-    fig_overall.update_traces(mode='lines+markers')
-    fig_overall.update_layout(
-        xaxis_title='Discount',
-        yaxis_title='Amount',
-        legend_title='Metrics'
-    )
-    # Customize colors for the lines
-    fig_overall.update_traces(line=dict(color='blue'), selector=dict(name='sales'))
-    fig_overall.update_traces(line=dict(color='red'), selector=dict(name='profit'))
+
+    # Show overall discount impact using a line chart (aggregated only when the figure is not cached)
+    def build_discount_impact():
+        overall_discount_impact = analytics.discount_impact(dataset)
+        fig_overall = px.line(overall_discount_impact, x='discount', y=['sales', 'profit'],
+                              title="Overall Sales and Profit by Discount",
+                              labels={'sales': 'Total Sales', 'profit': 'Total Profit'},
+                              markers=True)
+        fig_overall.update_traces(mode='lines+markers')
+        fig_overall.update_layout(
+            xaxis_title='Discount',
+            yaxis_title='Amount',
+            legend_title='Metrics'
+        )
+        # Customize colors for the lines
+        fig_overall.update_traces(line=dict(color='blue'), selector=dict(name='sales'))
+        fig_overall.update_traces(line=dict(color='red'), selector=dict(name='profit'))
     
-    # Add hover data to display detailed information
-    fig_overall.update_traces(
-        hovertemplate='Discount: %{x}<br>Sales: %{y}<br>Profit: %{customdata[1]}<extra></extra>',
-        customdata=overall_discount_impact[['discount', 'profit']].values
-    )
-    st.plotly_chart(fig_overall)
+        # Add hover data to display detailed information
+        fig_overall.update_traces(
+            hovertemplate='Discount: %{x}<br>Sales: %{y}<br>Profit: %{customdata[1]}<extra></extra>',
+            customdata=overall_discount_impact[['discount', 'profit']].values
+        )
+        return fig_overall
+    show_figure(('discount_impact',), build_discount_impact)
 
     
 # Product Performance Analysis
@@ -374,79 +502,84 @@ elif subpage == "Product Performance":
     st.header("Product Performance")
 
     # Add date filter and region filter at the top
-    start_date = st.date_input("Start Date", value=pd.to_datetime("2019-01-01"))
-    end_date = st.date_input("End Date", value=pd.to_datetime("2020-12-31"))
-    
-    # Ensure the 'order_date' column is in datetime format
-    df['order_date'] = pd.to_datetime(df['order_date'])
+    start_date = st.date_input("Start Date", value=DEFAULT_RANGE[0])
+    end_date = st.date_input("End Date", value=DEFAULT_RANGE[1])
     
-    # Filter data by date range
-    df_filtered = df[(df['order_date'] >= pd.to_datetime(start_date)) & (df['order_date'] <= pd.to_datetime(end_date))]
-
     # Region filter (optional)
-    region_options = ["All Regions"] + list(df['region'].unique())
+    region_options = ["All Regions"] + dataset.distinct('region')
     selected_region = st.selectbox("Select Region", options=region_options, index=0)
 
-    # Filter data based on the selected region (if region is selected)
-    if selected_region != "All Regions":
-        filtered_df = df_filtered[df_filtered['region'] == selected_region]
-    else:
-        filtered_df = df_filtered  # If no region is selected, use the full dataset
+    # Number of products to rank
+    k = st.slider("Number of Products", min_value=1, max_value=20, value=5)
+
+    # Add button to toggle between top k highest and lowest products
+    toggle_button = st.radio("Choose Products to Display", ("top", "bottom"),
+                             format_func=lambda option: f"Top {k} Performing Products" if option == "top" else f"Top {k} Lowest Performing Products")
 
-    # Add button to toggle between top 5 highest and lowest products
-    toggle_button = st.radio("Choose Products to Display", ("Top 5 Performing Products", "Top 5 Lowest Performing Products"))
+    # Products ranked by sales for the date range and region; the per-product totals are cached per filter,
+    # so toggling or changing k does not recompute them
+    ranked_products = analytics.ranked_products(dataset, k, start_date, end_date,
+                                                region=None if selected_region == "All Regions" else selected_region,
+                                                ascending=toggle_button == "bottom")
+    region_label = selected_region if selected_region != 'All Regions' else 'All Regions'
 
-    if toggle_button == "Top 5 Performing Products":
-        # Top 5 Products by Sales
-        st.subheader("Top 5 Products by Sales")
-        top_products = filtered_df.groupby('product_name')['sales'].sum().reset_index().sort_values(by='sales', ascending=False).head(5)
+    if toggle_button == "top":
+        # Top k Products by Sales
+        st.subheader(f"Top {k} Products by Sales")
+        top_products = ranked_products[['product_name', 'sales']]
 
         # Show the top products in a table
-        st.dataframe(top_products)
+        show_table("top_products", top_products)
 
-        # Visualize the top 5 products by sales using a bar chart
-        fig_top_products = px.bar(top_products, y='product_name', x='sales', title=f"Top 5 Products by Sales in {selected_region if selected_region != 'All Regions' else 'All Regions'}",
-                                  labels={'sales': 'Total Sales', 'product_name': 'Product'})
-        st.plotly_chart(fig_top_products)
+        # Visualize the top k products by sales using a bar chart
+        def build_top_products():
+            fig_top_products = px.bar(top_products, y='product_name', x='sales', title=f"Top {k} Products by Sales in {region_label}",
+                                      labels={'sales': 'Total Sales', 'product_name': 'Product'})
+            return fig_top_products
+        show_figure(('top_products', start_date, end_date, selected_region, k), build_top_products)
 
-        # Profit for Top 5 Products
-        st.subheader("Profit for Top 5 Products")
-        top_products_profit = filtered_df[filtered_df['product_name'].isin(top_products['product_name'])]
-        top_products_profit = top_products_profit.groupby('product_name')['profit'].sum().reset_index()
+        # Profit for Top k Products
+        st.subheader(f"Profit for Top {k} Products")
+        top_products_profit = analytics.ranked_products_profit(ranked_products)
 
         # Show the profit for the top products in a table
-        st.dataframe(top_products_profit)
+        show_table("top_products_profit", top_products_profit)
 
-        # Visualize the profit for top 5 products using a bar chart
-        fig_top_profit = px.bar(top_products_profit, y='product_name', x='profit', title=f"Profit for Top 5 Products in {selected_region if selected_region != 'All Regions' else 'All Regions'}",
-                                labels={'profit': 'Total Profit', 'product_name': 'Product'}, )
-        st.plotly_chart(fig_top_profit)
+        # Visualize the profit for top k products using a bar chart
+        def build_top_profit():
+            fig_top_profit = px.bar(top_products_profit, y='product_name', x='profit', title=f"Profit for Top {k} Products in {region_label}",
+                                    labels={'profit': 'Total Profit', 'product_name': 'Product'}, )
+            return fig_top_profit
+        show_figure(('top_profit', start_date, end_date, selected_region, k), build_top_profit)
 
-    elif toggle_button == "Top 5 Lowest Performing Products":
-        # Top 5 Lowest Products by Sales (loss-making products)
-        st.subheader("Top 5 Lowest Performing Products by Sales")
-        bottom_products = filtered_df.groupby('product_name')['sales'].sum().reset_index().sort_values(by='sales', ascending=True).head(5)
+    elif toggle_button == "bottom":
+        # Top k Lowest Products by Sales (loss-making products)
+        st.subheader(f"Top {k} Lowest Performing Products by Sales")
+        bottom_products = ranked_products[['product_name', 'sales']]
 
         # Show the lowest performing products in a table
-        st.dataframe(bottom_products)
+        show_table("bottom_products", bottom_products)
 
-        # Visualize the bottom 5 products by sales using a bar chart
-        fig_bottom_products = px.bar(bottom_products, y='product_name', x='sales', title=f"Bottom 5 Products by Sales in {selected_region if selected_region != 'All Regions' else 'All Regions'}",
-                                     labels={'sales': 'Total Sales', 'product_name': 'Product'})
-        st.plotly_chart(fig_bottom_products)
+        # Visualize the bottom k products by sales using a bar chart
+        def build_bottom_products():
+            fig_bottom_products = px.bar(bottom_products, y='product_name', x='sales', title=f"Bottom {k} Products by Sales in {region_label}",
+                                         labels={'sales': 'Total Sales', 'product_name': 'Product'})
+            return fig_bottom_products
+        show_figure(('bottom_products', start_date, end_date, selected_region, k), build_bottom_products)
 
-        # Profit for Bottom 5 Products
-        st.subheader("Profit/Loss for Bottom 5 Products")
-        bottom_products_profit = filtered_df[filtered_df['product_name'].isin(bottom_products['product_name'])]
-        bottom_products_profit = bottom_products_profit.groupby('product_name')['profit'].sum().reset_index()
+        # Profit for Bottom k Products
+        st.subheader(f"Profit/Loss for Bottom {k} Products")
+        bottom_products_profit = analytics.ranked_products_profit(ranked_products)
 
         # Show the profit/loss for the bottom products in a table
-        st.dataframe(bottom_products_profit)
+        show_table("bottom_products_profit", bottom_products_profit)
 
-        # Visualize the profit/loss for bottom 5 products using a bar chart
-        fig_bottom_profit = px.bar(bottom_products_profit, y='product_name', x='profit', title=f"Profit/Loss for Bottom 5 Products in {selected_region if selected_region != 'All Regions' else 'All Regions'}",
-                                   labels={'profit': 'Profit/Loss', 'product_name': 'Product'}, )
-        st.plotly_chart(fig_bottom_profit)
+        # Visualize the profit/loss for bottom k products using a bar chart
+        def build_bottom_profit():
+            fig_bottom_profit = px.bar(bottom_products_profit, y='product_name', x='profit', title=f"Profit/Loss for Bottom {k} Products in {region_label}",
+                                       labels={'profit': 'Profit/Loss', 'product_name': 'Product'}, )
+            return fig_bottom_profit
+        show_figure(('bottom_profit', start_date, end_date, selected_region, k), build_bottom_profit)
 
 
 # State-wise Performance Analysis
@@ -454,74 +587,147 @@ elif subpage == "State-wise Performance":
     st.header("State-wise Performance")
 
     # Add date filter and region filter at the top
-    min_date = df['order_date'].min()
-    max_date = df['order_date'].max()
+    min_date = dataset.dates.min_date
+    max_date = dataset.dates.max_date
 
     start_date = st.date_input("Start Date", value=min_date)
     end_date = st.date_input("End Date", value=max_date)
 
-    # Ensure 'order_date' is in datetime format
-    df['order_date'] = pd.to_datetime(df['order_date'])
-
-    # Filter data by date range (default to all time if no specific range is selected)
-    df_filtered = df[(df['order_date'] >= pd.to_datetime(start_date)) & (df['order_date'] <= pd.to_datetime(end_date))]
-
     # Region filter (optional) with "All Regions" as default
-    region_options = ["All Regions"] + list(df['region'].unique())
+    region_options = ["All Regions"] + dataset.distinct('region')
     selected_region = st.selectbox("Select Region", options=region_options, index=0)
 
-    # Filter data based on the selected region (default to all regions if "All Regions" is selected)
-    if selected_region != "All Regions":
-        df_filtered = df_filtered[df_filtered['region'] == selected_region]
-
     # Total Quantity Sold by State
     st.subheader("Total Quantity Sold by State")
 
-    # Group data by state and calculate total quantity sold
-    product_sales = df_filtered.groupby('state')['quantity'].sum().reset_index()
+    # Roll up total quantity sold by state for the date range and region (default to all regions if "All Regions" is selected)
+    product_sales = analytics.quantity_by_state(dataset, start_date, end_date,
+                                                region=None if selected_region == "All Regions" else selected_region)
 
     # Create a horizontal bar chart with Plotly
-    fig = px.bar(product_sales, 
-                 x='quantity', 
-                 y='state', 
-                 title=f'Total Quantity Sold by State in {selected_region if selected_region != "All Regions" else "All Regions"}',
-                 labels={'quantity': 'Total Quantity', 'state': 'State'},
-                 orientation='h',  # Horizontal bar chart
-                 color='quantity',  # Color by quantity for better visualization
-                 color_continuous_scale='viridis')  # Use the 'viridis' color palette
-
-    # Customize layout
-    fig.update_layout(xaxis_title='Total Quantity', 
-                      yaxis_title='State',
-                      title_x=0.5, 
-                      template='plotly_white',
-                      width=800, 
-                      height=600)
+    def build_state_quantity():
+        fig = px.bar(product_sales, 
+                     x='quantity', 
+                     y='state', 
+                     title=f'Total Quantity Sold by State in {selected_region if selected_region != "All Regions" else "All Regions"}',
+                     labels={'quantity': 'Total Quantity', 'state': 'State'},
+                     orientation='h',  # Horizontal bar chart
+                     color='quantity',  # Color by quantity for better visualization
+                     color_continuous_scale='viridis')  # Use the 'viridis' color palette
+
+        # Customize layout
+        fig.update_layout(xaxis_title='Total Quantity', 
+                          yaxis_title='State',
+                          title_x=0.5, 
+                          template='plotly_white',
+                          width=800, 
+                          height=600)
+        return fig
 
     # Display the plot in Streamlit
-    st.plotly_chart(fig)
+    show_figure(('state_quantity', start_date, end_date, selected_region), build_state_quantity)
 
 
-# # Sales Trends by Seasonality
-# elif subpage == "Sales Trends by Seasonality":
-#     st.header("Sales Trends by Seasonality")
-    
-#     # Monthly Sales Trend
-#     st.subheader("Monthly Sales Trend")
-#     df['order_date'] = pd.to_datetime(df['order_date'])
-#     df['month'] = df['order_date'].dt.month
-#     monthly_sales = df.groupby('month')['sales'].sum().reset_index()
-#     fig = px.line(monthly_sales, x='month', y='sales', title='Monthly Sales Trend')
-#     st.plotly_chart(fig)
+# Sales Trends by Seasonality
+elif subpage == "Sales Trends by Seasonality":
+    st.header("Sales Trends by Seasonality")
+
+    # Every zoom level is read from precomputed day/week/month/quarter rollups, never from order rows
+    resolutions = {"Day": "day", "Week": "week", "Month": "month", "Quarter": "quarter"}
+    measures = {"Sales": "sales", "Profit": "profit", "Quantity": "quantity"}
+    selected_resolution = st.selectbox("Select Resolution", options=list(resolutions), index=2)
+    selected_measure = st.selectbox("Select Measure", options=list(measures), index=0)
+    min_date = dataset.dates.min_date
+    max_date = dataset.dates.max_date
+    start_date = st.date_input("Start Date", value=min_date)
+    end_date = st.date_input("End Date", value=max_date)
+    selected_region = st.selectbox("Select Region", options=["All Regions"] + dataset.distinct('region'), index=0)
+    selected_category = st.selectbox("Select Category", options=["All Categories"] + dataset.distinct('category'), index=0)
+    window = st.slider("Rolling Average (periods)", min_value=1, max_value=12, value=3)
+    resolution = resolutions[selected_resolution]
+    measure = measures[selected_measure]
+    region = None if selected_region == "All Regions" else selected_region
+    category = None if selected_category == "All Categories" else selected_category
+
+    # Trend with its rolling average
+    st.subheader(f"{selected_measure} Trend by {selected_resolution}")
+    trend = analytics.sales_trend(dataset, resolution, measure, start_date, end_date, region=region,
+                                  category=category, window=window)
+
+    def build_trend():
+        points = downsample(trend, 'period', [measure, 'rolling_mean'])
+        fig = px.line(points, x='period', y=[measure, 'rolling_mean'],
+                      title=f'{selected_measure} by {selected_resolution} ({window}-period rolling average)',
+                      labels={'period': selected_resolution, 'value': selected_measure, 'variable': ''},
+                      render_mode=render_mode(len(points)))
+        fig.update_layout(template='plotly_white')
+        return fig
+    show_figure(('seasonality_trend', resolution, measure, start_date, end_date, region, category, window),
+                build_trend)
+
+    # Year-over-year overlay: one line per year against the position within the year
+    st.subheader("Year-over-Year Comparison")
+    overlay = analytics.seasonality(dataset, resolution, measure, start_date, end_date, region=region,
+                                    category=category)
+
+    def build_overlay():
+        fig = px.line(overlay, x='position', y=measure, color=overlay['year'].astype(str),
+                      title=f'{selected_measure} by {selected_resolution} of the Year',
+                      labels={'position': f'{selected_resolution} of Year', measure: selected_measure, 'color': 'Year'},
+                      render_mode=render_mode(len(overlay)))
+        fig.update_layout(template='plotly_white')
+        return fig
+    show_figure(('seasonality_overlay', resolution, measure, start_date, end_date, region, category),
+                build_overlay)
 
 # Correlation Analysis
 elif subpage == "Correlation Analysis":
     st.header("Correlation Analysis")
     
-    # Display correlation heatmap using seaborn
+    # Optional filters; the matrix is merged from per-day/region/category statistics without rescanning rows
+    min_date = dataset.dates.min_date
+    max_date = dataset.dates.max_date
+    start_date = st.date_input("Start Date", value=min_date)
+    end_date = st.date_input("End Date", value=max_date)
+    selected_region = st.selectbox("Select Region", options=["All Regions"] + dataset.distinct('region'), index=0)
+    selected_category = st.selectbox("Select Category", options=["All Categories"] + dataset.distinct('category'), index=0)
+    region = None if selected_region == "All Regions" else selected_region
+    category = None if selected_category == "All Categories" else selected_category
+
+    # Display correlation heatmap using seaborn (rendered once per filter and cached)
     st.subheader("Correlation Heatmap")
-    corr = df[['sales', 'profit', 'quantity', 'discount']].corr()
-    fig, ax = plt.subplots(figsize=(10, 6))
-    sns.heatmap(corr, annot=True, cmap='coolwarm', linewidths=0.5, ax=ax)
-    ax.set_title('Correlation Matrix')
-    st.pyplot(fig) 
+
+    def render_heatmap():
+        # seaborn and matplotlib are only needed here, so they are imported on first use
+        import matplotlib.pyplot as plt
+        import seaborn as sns
+
+        corr = analytics.correlation_matrix(dataset, start_date, end_date, region=region, category=category)
+        fig, ax = plt.subplots(figsize=(10, 6))
+        sns.heatmap(corr, annot=True, cmap='coolwarm', linewidths=0.5, ax=ax)
+        ax.set_title('Correlation Matrix')
+        buffer = io.BytesIO()
+        fig.savefig(buffer, format='png', bbox_inches='tight')
+        plt.close(fig)
+        return buffer.getvalue()
+
+    st.image(get_figure_cache().image((dataset.key, subpage, start_date, end_date, region, category),
+                                      traced_build(("correlation_heatmap", start_date, end_date, region, category),
+                                                   render_heatmap)))
+
+# Timing panel for this rerun (the plotly_chart spans above are complete by now)
+if st.sidebar.checkbox("Show timings", key="show_timings"):
+    records = pd.DataFrame(trace.finish())
+    warmed = sum(state == 'done' for state in warmup.status.values())
+    st.sidebar.caption(f"Rerun took {trace.seconds * 1000:.0f} ms; {warmed}/{len(warmup.status)} pages warmed up")
+    timings = pd.DataFrame({
+        'span': ["\u2003" * depth + name for depth, name in zip(records['depth'], records['span'])],
+        'detail': records['detail'],
+        'ms': (records['seconds'] * 1000).round(1),
+        'rows in': records['rows_in'].astype('Int64'),
+        'rows out': records['rows_out'].astype('Int64'),
+        'peak MB': (records['peak_bytes'].astype(float) / 1024 ** 2).round(2),
+    })
+    st.sidebar.dataframe(timings.iloc[:-1], hide_index=True)
+else:
+    trace.finish()
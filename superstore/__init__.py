@@ -0,0 +1 @@
+"""Data loading and analytics helpers for the Superstore Sales Analysis app."""
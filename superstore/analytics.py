@@ -0,0 +1,192 @@
+"""Headless analytics behind every page of the app.
+
+Each function takes a :class:`~superstore.dataset.Dataset` (or an
+out-of-core :class:`~superstore.outofcore.ChunkedDataset`) plus the page's
+filter values and returns plain pandas objects; nothing here imports
+Streamlit, so the same numbers can be produced by the app, a notebook or the
+batch CLI. A ``None`` region, category or date bound means "no filter".
+Every page function is recorded as a ``groupby`` span when a
+:mod:`~superstore.spans` trace is active.
+"""
+import pandas as pd
+
+from superstore.spans import traced
+from superstore.timeseries import rolling_mean, year_position
+
+
+@traced('groupby')
+def sales_by_region(dataset):
+    """Total sales per region (Regional Performance Analysis)."""
+    return dataset.cube.rollup('region', 'sales')
+
+
+@traced('groupby')
+def margin_by_region(dataset):
+    """Average profit margin per region (Regional Performance Analysis)."""
+    return dataset.cube.rollup('region', 'profit_margin')
+
+
+@traced('groupby')
+def category_sales(dataset, category, start=None, end=None, region=None):
+    """Sales and profit per subcategory of ``category``, best selling first (Product Category Analysis)."""
+    return dataset.cube.rollup('subcategory', ['sales', 'profit'], start, end,
+                               region=region, category=category).sort_values(by='sales', ascending=False)
+
+
+@traced('groupby')
+def customer_count(dataset):
+    """Number of distinct customers (Customer Sales Analytics)."""
+    return dataset.customers.count
+
+
+@traced('groupby')
+def distinct_count(dataset, column='customer', start=None, end=None, region=None, category=None, exact=False):
+    """Distinct ``customer`` or ``product_name`` values in the filtered rows (Customer Sales Analytics).
+
+    Merged from HyperLogLog sketches, so it is an estimate (see
+    :mod:`superstore.sketches` for the error bound) unless ``exact`` is set,
+    which counts the matching rows instead.
+    """
+    if exact:
+        return dataset.count_distinct(column, start, end, region=region, category=category)
+    return dataset.sketches[column].count(start, end, region=region, category=category)
+
+
+@traced('groupby')
+def top_customers(dataset, k=5, measure='profit'):
+    """The ``k`` customers with the highest ``measure`` (Customer Sales Analytics)."""
+    return dataset.customers.top(k, measure)
+
+
+@traced('groupby')
+def customers_between(dataset, start=None, end=None):
+    """Customers with orders in the date range, in order of first order."""
+    return dataset.customers.customers_between(start, end)
+
+
+@traced('groupby')
+def customer_purchases(dataset, customer, start=None, end=None):
+    """One customer's orders in the date range, oldest first."""
+    return dataset.customers.rows(customer, start, end)
+
+
+@traced('groupby')
+def customer_product_sales(purchases):
+    """Sales per product for the rows returned by :func:`customer_purchases`."""
+    return purchases.groupby('product_name', observed=True)['sales'].sum().reset_index()
+
+
+@traced('groupby')
+def customer_sales_over_time(purchases):
+    """Sales per order date for the rows returned by :func:`customer_purchases`."""
+    return purchases.groupby('order_date')['sales'].sum().reset_index()
+
+
+@traced('groupby')
+def total_profit(dataset, start=None, end=None, region=None):
+    """Total profit for the filter (Profit Analytics)."""
+    return dataset.cube.total('profit', start, end, region=region)
+
+
+@traced('groupby')
+def regions_between(dataset, start=None, end=None):
+    """Regions with orders in the date range, in cube order."""
+    return list(dataset.cube.select(start, end)['region'].unique())
+
+
+@traced('groupby')
+def categories_between(dataset, start=None, end=None):
+    """Categories with orders in the date range, in cube order."""
+    return list(dataset.cube.select(start, end)['category'].unique())
+
+
+@traced('groupby')
+def profit_by_region(dataset, start=None, end=None, region=None):
+    """Profit per region (Profit Analytics)."""
+    return dataset.cube.rollup('region', 'profit', start, end, region=region)
+
+
+@traced('groupby')
+def profit_by_subcategory(dataset, start=None, end=None, category=None):
+    """Profit per subcategory (Profit Analytics)."""
+    return dataset.cube.rollup('subcategory', 'profit', start, end, category=category)
+
+
+@traced('groupby')
+def discount_impact(dataset):
+    """Sales and profit per discount level over the whole dataset (Discount Strategy Analysis)."""
+    return dataset.discount_totals
+
+
+@traced('groupby')
+def ranked_products(dataset, k=5, start=None, end=None, region=None, ascending=False):
+    """The ``k`` best (or worst) selling products with their sales and profit (Product Performance)."""
+    return dataset.products.rank(k, start, end, region=region, ascending=ascending)
+
+
+@traced('groupby')
+def ranked_products_profit(ranked):
+    """Profit of the products in :func:`ranked_products`, by product name."""
+    return ranked[['product_name', 'profit']].sort_values('product_name').reset_index(drop=True)
+
+
+@traced('groupby')
+def quantity_by_state(dataset, start=None, end=None, region=None):
+    """Total quantity sold per state (State-wise Performance)."""
+    return dataset.cube.rollup('state', 'quantity', start, end, region=region)
+
+
+@traced('groupby')
+def sales_trend(dataset, resolution='month', measure='sales', start=None, end=None, region=None, category=None,
+                window=1):
+    """``measure`` per day, week, month or quarter, with a trailing ``window``-period average (Sales Trends by Seasonality)."""
+    trend = dataset.timeseries.series(resolution, measure, start, end, region=region, category=category)
+    trend['rolling_mean'] = rolling_mean(trend[measure].to_numpy(), window)
+    return trend
+
+
+@traced('groupby')
+def seasonality(dataset, resolution='month', measure='sales', start=None, end=None, region=None, category=None):
+    """``measure`` per period with its year and position in the year, for a year-over-year overlay."""
+    trend = dataset.timeseries.series(resolution, measure, start, end, region=region, category=category)
+    year, position = year_position(trend['period'], resolution)
+    return pd.DataFrame({'year': year, 'position': position, measure: trend[measure].to_numpy()})
+
+
+@traced('groupby')
+def correlation_matrix(dataset, start=None, end=None, region=None, category=None):
+    """Correlation of sales, profit, quantity and discount (Correlation Analysis)."""
+    return dataset.correlations.correlation(start, end, region=region, category=category)
+
+
+def default_reports(dataset, k=5):
+    """Every page's results for the default, unfiltered view, keyed by report name.
+
+    Selection-driven views (one customer, one category) are reported for all
+    values at once.
+    """
+    cube = dataset.cube
+    correlation = correlation_matrix(dataset)
+    return {
+        'sales_by_region': sales_by_region(dataset),
+        'margin_by_region': margin_by_region(dataset),
+        'category_sales': cube.rollup(['category', 'subcategory'], ['sales', 'profit']),
+        'customer_totals': dataset.customers.totals.reset_index(),
+        'top_customers': top_customers(dataset, k),
+        'profit_by_region': profit_by_region(dataset),
+        'profit_by_subcategory': profit_by_subcategory(dataset),
+        'discount_impact': discount_impact(dataset),
+        'top_products': ranked_products(dataset, k).reset_index(drop=True),
+        'bottom_products': ranked_products(dataset, k, ascending=True).reset_index(drop=True),
+        'quantity_by_state': quantity_by_state(dataset),
+        'monthly_sales': sales_trend(dataset, 'month'),
+        'correlation': correlation.rename_axis('metric').reset_index(),
+        'summary': pd.DataFrame({
+            'rows': [len(dataset)],
+            'customers': [customer_count(dataset)],
+            'total_sales': [cube.total('sales')],
+            'total_profit': [total_profit(dataset)],
+            'first_order': [dataset.dates.min_date],
+            'last_order': [dataset.dates.max_date],
+        }),
+    }
@@ -0,0 +1,117 @@
+"""Compute every page's report for many workbooks in parallel.
+
+Usage::
+
+    python -m superstore.batch OUTPUT_DIR store1.xlsx store2.xlsx ... [--workers N] [--top-k K]
+
+Each workbook (or ``.csv``/``.parquet`` export) is loaded through
+:func:`superstore.readers.read_source`, normalized and run through
+:func:`superstore.analytics.default_reports` in its own worker process.
+Reports are written as Parquet files, one directory per workbook::
+
+    OUTPUT_DIR/<workbook stem>/<report>.parquet
+
+plus ``OUTPUT_DIR/_manifest.parquet`` listing every workbook with its
+status, row count and timing.
+"""
+import argparse
+import glob
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import pandas as pd
+
+from superstore import analytics
+from superstore.cache import file_digest
+from superstore.dataset import Dataset
+from superstore.readers import FORMATS, read_source
+
+
+def load_dataset(path):
+    """Parse and normalize an ``.xlsx``, ``.csv`` or ``.parquet`` file from disk."""
+    return Dataset(read_source(path), key=file_digest(path))
+
+
+def output_name(path):
+    """Directory name for a workbook's reports."""
+    return os.path.splitext(os.path.basename(path))[0]
+
+
+def write_reports(reports, target):
+    """Write each report frame to ``target/<report>.parquet``."""
+    os.makedirs(target, exist_ok=True)
+    for name, frame in reports.items():
+        # Parquet needs string column names and plain (non-categorical-index) frames
+        frame = frame.reset_index(drop=True)
+        frame.columns = [str(column) for column in frame.columns]
+        frame.to_parquet(os.path.join(target, f"{name}.parquet"), index=False)
+
+
+def process_workbook(path, output_dir, k=5):
+    """Compute and write all reports for one workbook; runs in a worker process."""
+    started = time.perf_counter()
+    dataset = load_dataset(path)
+    reports = analytics.default_reports(dataset, k=k)
+    write_reports(reports, os.path.join(output_dir, output_name(path)))
+    return {'rows': len(dataset), 'reports': len(reports), 'seconds': time.perf_counter() - started}
+
+
+def expand(paths):
+    """Expand directories and glob patterns into a sorted list of workbooks (or CSV/Parquet exports)."""
+    files = []
+    for path in paths:
+        if os.path.isdir(path):
+            for fmt in FORMATS:
+                files += glob.glob(os.path.join(path, f'*.{fmt}'))
+        else:
+            files += glob.glob(path) or [path]
+    return sorted(dict.fromkeys(files))
+
+
+def run(paths, output_dir, workers=None, k=5):
+    """Process ``paths`` across a process pool and return the manifest frame."""
+    files = expand(paths)
+    names = [output_name(path) for path in files]
+    duplicates = {name for name in names if names.count(name) > 1}
+    if duplicates:
+        raise ValueError(f"workbooks would share an output directory: {', '.join(sorted(duplicates))}")
+    os.makedirs(output_dir, exist_ok=True)
+
+    results = []
+    with ProcessPoolExecutor(max_workers=workers or os.cpu_count()) as pool:
+        futures = {pool.submit(process_workbook, path, output_dir, k): path for path in files}
+        for future in as_completed(futures):
+            path = futures[future]
+            try:
+                results.append({'workbook': path, 'status': 'ok', 'error': None, **future.result()})
+            except Exception as exc:
+                results.append({'workbook': path, 'status': 'failed', 'error': f"{type(exc).__name__}: {exc}",
+                                'rows': None, 'reports': None, 'seconds': None})
+            print(f"[{len(results)}/{len(files)}] {results[-1]['status']:<6} {path}", file=sys.stderr)
+
+    manifest = pd.DataFrame(results, columns=['workbook', 'status', 'error', 'rows', 'reports', 'seconds'])
+    manifest = manifest.sort_values('workbook', ignore_index=True)
+    manifest.to_parquet(os.path.join(output_dir, '_manifest.parquet'), index=False)
+    return manifest
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Compute every Superstore report for many workbooks in parallel.")
+    parser.add_argument('output_dir', help="directory for the Parquet reports")
+    parser.add_argument('workbooks', nargs='+', help="workbooks, directories or glob patterns")
+    parser.add_argument('--workers', type=int, default=None, help="worker processes (default: all cores)")
+    parser.add_argument('--top-k', type=int, default=5, help="number of top/bottom products and customers")
+    args = parser.parse_args(argv)
+
+    manifest = run(args.workbooks, args.output_dir, workers=args.workers, k=args.top_k)
+    failed = manifest[manifest['status'] != 'ok']
+    print(f"{len(manifest) - len(failed)} of {len(manifest)} workbooks processed into {args.output_dir}")
+    for _, row in failed.iterrows():
+        print(f"FAILED {row['workbook']}: {row['error']}", file=sys.stderr)
+    return 1 if len(failed) else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
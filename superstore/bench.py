@@ -0,0 +1,198 @@
+"""Benchmark suite for loading, normalization and every page computation.
+
+Runs each case against synthetic datasets (see :mod:`superstore.synthetic`)
+and records the best wall time over a few repeats and the peak memory
+allocated (tracemalloc) of one extra run. Results can be stored as a
+baseline and later runs compared against it::
+
+    python -m superstore.bench --sizes 10k 1m --save-baseline
+    python -m superstore.bench --sizes 10k 1m --compare      # exits 1 on regression
+
+Generated datasets are cached as Parquet under the sidecar cache directory
+so repeated runs skip generation.
+"""
+import argparse
+import gc
+import json
+import os
+import platform
+import sys
+import time
+import tracemalloc
+
+import pandas as pd
+
+from superstore import analytics, synthetic
+from superstore.dataset import Dataset, normalize
+from superstore.ranking import ProductRanking
+
+DEFAULT_BASELINE = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'benchmarks',
+                                'baseline.json')
+
+# A case is slower than its baseline when it exceeds it by this factor
+DEFAULT_TOLERANCE = 1.3
+
+# Cases faster than this are too noisy to flag
+MIN_SECONDS = 0.005
+
+
+def dataset_path(size, seed=0, cache_dir=None):
+    """Parquet file holding the synthetic dataset of ``size`` rows, generated on first use."""
+    cache_dir = cache_dir or os.environ.get('SUPERSTORE_CACHE_DIR') or os.path.join(
+        os.path.dirname(os.path.dirname(os.path.abspath(__file__))), '.cache')
+    os.makedirs(cache_dir, exist_ok=True)
+    path = os.path.join(cache_dir, f"synthetic-{size}-seed{seed}.parquet")
+    if not os.path.exists(path):
+        tmp = path + '.tmp.parquet'
+        synthetic.write(tmp, size, seed=seed)
+        os.replace(tmp, path)
+    return path
+
+
+def _middle_range(dataset):
+    # The middle half of the date range, a typical page filter
+    lo, hi = dataset.dates.min_date, dataset.dates.max_date
+    return lo + (hi - lo) / 4, hi - (hi - lo) / 4
+
+
+def cases(path):
+    """Benchmark cases for the dataset at ``path``, as ``(name, setup, run)`` triples.
+
+    ``setup`` returns the state ``run`` needs and is not timed. Page cases
+    query a dataset whose derived structures are already built, so they time
+    a warm rerun; ``page.products`` times the uncached product totals.
+    """
+    def raw():
+        return pd.read_parquet(path)
+
+    prepared = []
+
+    def built():
+        # Built once and shared by the query cases, like the app's per-dataset cache
+        if not prepared:
+            dataset = Dataset(pd.read_parquet(path), key=path)
+            for structure in ('cube', 'dates', 'customers', 'products', 'correlations'):
+                getattr(dataset, structure)
+            dataset.dates.positions(region=dataset.distinct('region')[0])
+            prepared.append(dataset)
+        return prepared[0]
+
+    def fresh():
+        return Dataset(pd.read_parquet(path), key=path)
+
+    def query(func):
+        # Page queries run on a dataset whose derived structures are already built
+        def run(dataset):
+            start, end = _middle_range(dataset)
+            return func(dataset, start, end, dataset.distinct('region')[0], dataset.distinct('category')[0])
+        return run
+
+    def mask_filter(dataset):
+        start, end = _middle_range(dataset)
+        frame = dataset.frame
+        return frame[(frame['order_date'] >= start) & (frame['order_date'] <= end) & (frame['region'] == dataset.distinct('region')[0])]
+
+    return [
+        ('load.parquet', lambda: None, lambda _: raw()),
+        ('normalize', raw, normalize),
+        ('build.cube', fresh, lambda d: d.cube),
+        ('build.date_index', fresh, lambda d: d.dates.positions(region=d.distinct('region')[0])),
+        ('build.customers', fresh, lambda d: d.customers),
+        ('build.correlations', fresh, lambda d: d.correlations),
+        ('filter.mask_scan', built, mask_filter),
+        ('filter.date_index', built, query(lambda d, s, e, r, c: d.rows(s, e, region=r))),
+        ('page.regional', built, lambda d: (analytics.sales_by_region(d), analytics.margin_by_region(d))),
+        ('page.category', built, query(lambda d, s, e, r, c: analytics.category_sales(d, c, s, e, region=r))),
+        ('page.customer', built, query(lambda d, s, e, r, c: analytics.customer_purchases(
+            d, analytics.customers_between(d, s, e)[0], s, e))),
+        ('page.profit', built, query(lambda d, s, e, r, c: (analytics.profit_by_region(d, s, e, region=r),
+                                                             analytics.profit_by_subcategory(d, s, e, category=c)))),
+        ('page.discount', built, lambda d: analytics.discount_impact(d)),
+        ('page.products', built, query(lambda d, s, e, r, c: ProductRanking(d.frame, d.dates).totals(s, e, region=r))),
+        ('page.products_cached', built, query(lambda d, s, e, r, c: analytics.ranked_products(d, 5, s, e, region=r))),
+        ('page.state', built, query(lambda d, s, e, r, c: analytics.quantity_by_state(d, s, e, region=r))),
+        ('page.correlation', built, query(lambda d, s, e, r, c: analytics.correlation_matrix(d, s, e, region=r))),
+    ]
+
+
+def measure(setup, run, repeat=3):
+    """Best wall time over ``repeat`` runs and the peak traced memory of one more run."""
+    best = float('inf')
+    for _ in range(repeat):
+        state = setup()
+        gc.collect()
+        started = time.perf_counter()
+        run(state)
+        best = min(best, time.perf_counter() - started)
+    state = setup()
+    gc.collect()
+    tracemalloc.start()
+    try:
+        run(state)
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return {'seconds': best, 'peak_mb': peak / 1e6}
+
+
+def run_suite(sizes, repeat=3, only=None):
+    """Results keyed by size label and case name."""
+    results = {}
+    for label in sizes:
+        path = dataset_path(synthetic.parse_size(label))
+        results[label] = {}
+        for name, setup, run in cases(path):
+            if only and not any(name.startswith(prefix) for prefix in only):
+                continue
+            results[label][name] = measure(setup, run, repeat=repeat)
+            print(f"{label:>5} {name:<22} {results[label][name]['seconds'] * 1000:10.2f} ms "
+                  f"{results[label][name]['peak_mb']:10.1f} MB", file=sys.stderr)
+    return results
+
+
+def compare(results, baseline, tolerance=DEFAULT_TOLERANCE):
+    """Cases that got slower than ``tolerance`` times their baseline (or used that much more memory)."""
+    regressions = []
+    for label, measured in results.items():
+        for name, now in measured.items():
+            before = baseline.get('results', {}).get(label, {}).get(name)
+            if before is None:
+                continue
+            if now['seconds'] > max(before['seconds'], MIN_SECONDS) * tolerance:
+                regressions.append(f"{label} {name}: {now['seconds'] * 1000:.2f} ms vs {before['seconds'] * 1000:.2f} ms")
+            if now['peak_mb'] > max(before['peak_mb'], 1.0) * tolerance:
+                regressions.append(f"{label} {name}: {now['peak_mb']:.1f} MB vs {before['peak_mb']:.1f} MB peak")
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the Superstore data pipeline and page computations.")
+    parser.add_argument('--sizes', nargs='+', default=['10k', '1m'], help="dataset sizes (10k, 1m, 10m, 50m, ...)")
+    parser.add_argument('--only', nargs='+', help="run only cases whose names start with these prefixes")
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--baseline', default=DEFAULT_BASELINE, help="baseline JSON file")
+    parser.add_argument('--save-baseline', action='store_true', help="store the results as the new baseline")
+    parser.add_argument('--compare', action='store_true', help="fail if results regress against the baseline")
+    parser.add_argument('--tolerance', type=float, default=DEFAULT_TOLERANCE)
+    args = parser.parse_args(argv)
+
+    results = run_suite(args.sizes, repeat=args.repeat, only=args.only)
+    status = 0
+    if args.compare:
+        with open(args.baseline) as fh:
+            regressions = compare(results, json.load(fh), args.tolerance)
+        for regression in regressions:
+            print(f"REGRESSION {regression}")
+        status = 1 if regressions else 0
+    if args.save_baseline:
+        baseline = {'machine': platform.platform(), 'python': platform.python_version(),
+                    'pandas': pd.__version__, 'results': results}
+        os.makedirs(os.path.dirname(os.path.abspath(args.baseline)), exist_ok=True)
+        with open(args.baseline, 'w') as fh:
+            json.dump(baseline, fh, indent=2, sort_keys=True)
+        print(f"Baseline written to {args.baseline}")
+    return status
+
+
+if __name__ == '__main__':
+    sys.exit(main())
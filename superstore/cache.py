@@ -0,0 +1,181 @@
+"""On-disk columnar cache for the default dataset.
+
+Parsing the source file (through :mod:`superstore.readers`; openpyxl for the
+bundled ``superstore.xlsx``) is the slowest step of a cold start, so the
+normalized frame is written once to an uncompressed Arrow IPC sidecar and
+memory-mapped on every later start. Numeric, date and categorical-code
+columns are zero-copy, read-only views of the mapping, so every worker
+process on the machine shares one copy of the data through the OS page cache
+instead of holding its own.
+
+The sidecar is keyed by the content hash of the source file and written
+under a temporary name before being renamed into place, so a refresh never
+changes a file another process has mapped: readers keep their old mapping
+until they reload, and new loads see the new file. The size and mtime of the
+source are recorded in a small manifest so an unchanged file is recognised
+without re-hashing it.
+"""
+import hashlib
+import json
+import os
+import tempfile
+
+from superstore.dataset import normalize
+from superstore.readers import read_source
+from superstore.spans import span
+
+CACHE_DIR_ENV = "SUPERSTORE_CACHE_DIR"
+MANIFEST_NAME = "manifest.json"
+
+# Bump whenever the layout of the cached frame changes
+CACHE_VERSION = 5
+
+
+def file_digest(path, chunk_size=1 << 20):
+    """Return the SHA-256 hex digest of a file, read in chunks."""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as fh:
+        for chunk in iter(lambda: fh.read(chunk_size), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def cache_dir_for(path):
+    """Directory holding the sidecars for ``path``.
+
+    Defaults to a ``.cache`` folder next to the source file and can be moved
+    with the ``SUPERSTORE_CACHE_DIR`` environment variable.
+    """
+    return os.environ.get(CACHE_DIR_ENV) or os.path.join(os.path.dirname(os.path.abspath(path)), '.cache')
+
+
+def _read_manifest(cache_dir):
+    try:
+        with open(os.path.join(cache_dir, MANIFEST_NAME)) as fh:
+            return json.load(fh)
+    except (OSError, ValueError):
+        return {}
+
+
+def _write_atomic(path, write):
+    # Write next to the target and rename so readers never see a partial file
+    fd, tmp = tempfile.mkstemp(dir=os.path.dirname(path), suffix='.tmp')
+    os.close(fd)
+    try:
+        write(tmp)
+        os.replace(tmp, path)
+    except BaseException:
+        if os.path.exists(tmp):
+            os.remove(tmp)
+        raise
+
+
+def _write_manifest(cache_dir, manifest):
+    def write(tmp):
+        with open(tmp, 'w') as fh:
+            json.dump(manifest, fh, indent=2, sort_keys=True)
+    _write_atomic(os.path.join(cache_dir, MANIFEST_NAME), write)
+
+
+def source_signature(path):
+    """``(size, mtime_ns)`` of ``path``; changes whenever the file is replaced or edited."""
+    stat = os.stat(path)
+    return stat.st_size, stat.st_mtime_ns
+
+
+def write_mapped(df, path):
+    """Write ``df`` as an uncompressed Arrow IPC file that :func:`read_mapped` can map."""
+    import pyarrow as pa
+    import pyarrow.feather as feather
+
+    # One record batch, so every column is contiguous and is mapped without being concatenated
+    table = pa.Table.from_pandas(df).combine_chunks()
+    feather.write_feather(table, path, compression='uncompressed', chunksize=max(len(df), 1))
+
+
+def read_mapped(path):
+    """Frame over a memory-mapped Arrow IPC file.
+
+    Columns without a pandas-specific layout (numbers, dates, categorical
+    codes) reference the mapped pages directly and are read-only; the mapping
+    stays open for as long as the frame is alive.
+    """
+    import pyarrow as pa
+
+    table = pa.ipc.open_file(pa.memory_map(path, 'r')).read_all()
+    return table.to_pandas(split_blocks=True)
+
+
+def _try(func, *args):
+    try:
+        func(*args)
+    except OSError:
+        pass
+
+
+def _try_read(path, fallback):
+    try:
+        return read_mapped(path)
+    except Exception:
+        return fallback
+
+
+def load_cached_source(path, parse=None):
+    """Load an ``.xlsx``, ``.csv`` or ``.parquet`` file through its columnar sidecar, building it on a miss.
+
+    Returns ``(frame, digest)`` where ``digest`` is the file's SHA-256.
+    ``parse`` turns the path into the typed frame; it defaults to
+    :func:`~superstore.readers.read_source` (the page columns only) followed
+    by :func:`~superstore.dataset.normalize`. If the
+    sidecar cannot be read or written (e.g. pyarrow is not installed or the
+    cache directory is read-only) the file is parsed directly.
+    """
+    if parse is None:
+        def parse(p):
+            with span('parse', detail=os.path.basename(p)) as record:
+                raw = read_source(p)
+                record.rows_out = len(raw)
+            return normalize(raw)
+
+    source = os.path.abspath(path)
+    stat = os.stat(source)
+    cache_dir = cache_dir_for(source)
+    manifest = _read_manifest(cache_dir)
+    entry = manifest.get(source, {})
+
+    # Fast path: same size and mtime as when the sidecar was built
+    if entry.get('size') == stat.st_size and entry.get('mtime_ns') == stat.st_mtime_ns:
+        digest = entry.get('sha256')
+    else:
+        digest = file_digest(source)
+
+    sidecar = os.path.join(cache_dir, f"{os.path.basename(source)}.{digest}.v{CACHE_VERSION}.arrow")
+    if entry.get('sha256') == digest and entry.get('version') == CACHE_VERSION and os.path.exists(sidecar):
+        try:
+            df = read_mapped(sidecar)
+        except Exception:
+            df = None
+        if df is not None:
+            if entry.get('mtime_ns') != stat.st_mtime_ns:
+                # Touched but unchanged: refresh the recorded mtime
+                manifest[source] = dict(entry, size=stat.st_size, mtime_ns=stat.st_mtime_ns)
+                _try(_write_manifest, cache_dir, manifest)
+            return df, digest
+
+    df = parse(source)
+    try:
+        os.makedirs(cache_dir, exist_ok=True)
+        _write_atomic(sidecar, lambda tmp: write_mapped(df, tmp))
+    except Exception:
+        return df, digest
+    # Serve the mapped copy, so this process does not keep the parsed frame on its heap
+    df = _try_read(sidecar, df)
+
+    # Drop the sidecar of the previous version of this file (processes that mapped it keep their pages)
+    old = entry.get('sidecar')
+    if old and old != sidecar and os.path.exists(old):
+        _try(os.remove, old)
+    manifest[source] = {'size': stat.st_size, 'mtime_ns': stat.st_mtime_ns, 'sha256': digest,
+                        'sidecar': sidecar, 'version': CACHE_VERSION}
+    _try(_write_manifest, cache_dir, manifest)
+    return df, digest
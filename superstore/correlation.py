@@ -0,0 +1,159 @@
+"""Mergeable covariance statistics for Correlation Analysis.
+
+:class:`Moments` holds the sufficient statistics of a set of rows (count,
+mean vector and co-moment matrix), updated Welford-style and merged with
+Chan's parallel formula, so they can be accumulated over chunks or combined
+across partitions without revisiting rows. :class:`CorrelationCube` keeps one
+set of moments per day x region x category cell; a filtered correlation
+matrix is the merge of the selected cells.
+
+Rows with a missing value in any of the columns are left out (listwise
+deletion), whereas ``DataFrame.corr`` drops missing values pair by pair.
+"""
+import numpy as np
+import pandas as pd
+
+from superstore.index import date_bounds
+
+CORRELATION_COLUMNS = ['sales', 'profit', 'quantity', 'discount']
+
+# Cell grain of the correlation cube, sorted by order_date
+CELL_DIMENSIONS = ['order_date', 'region', 'category']
+
+
+def _combine(groups, n_groups, n, mean, m2):
+    """Merge per-part moments that share a group id (Chan et al.).
+
+    ``n`` has shape (parts,), ``mean`` (parts, k) and ``m2`` (parts, k, k).
+    Returns the merged arrays with ``n_groups`` leading entries.
+    """
+    k = mean.shape[1]
+    total = np.bincount(groups, weights=n, minlength=n_groups)
+    weighted = np.stack([np.bincount(groups, weights=n * mean[:, i], minlength=n_groups) for i in range(k)], axis=1)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        merged_mean = np.where(total[:, None] > 0, weighted / total[:, None], 0.0)
+    delta = mean - merged_mean[groups]
+    spread = n[:, None, None] * delta[:, :, None] * delta[:, None, :]
+    merged_m2 = np.zeros((n_groups, k, k))
+    np.add.at(merged_m2, groups, m2 + spread)
+    return total, merged_mean, merged_m2
+
+
+class Moments:
+    """Count, mean and co-moment matrix of a set of observations."""
+
+    def __init__(self, n, mean, m2, columns=CORRELATION_COLUMNS):
+        self.n = float(n)
+        self.mean = np.asarray(mean, dtype=float)
+        self.m2 = np.asarray(m2, dtype=float)
+        self.columns = list(columns)
+
+    @classmethod
+    def empty(cls, columns=CORRELATION_COLUMNS):
+        k = len(columns)
+        return cls(0, np.zeros(k), np.zeros((k, k)), columns)
+
+    @classmethod
+    def from_frame(cls, df, columns=CORRELATION_COLUMNS):
+        values = df[columns].dropna().to_numpy(dtype=float)
+        if len(values) == 0:
+            return cls.empty(columns)
+        mean = values.mean(axis=0)
+        centered = values - mean
+        return cls(len(values), mean, centered.T @ centered, columns)
+
+    def update(self, df):
+        """Fold a chunk of rows into the statistics (in place) and return ``self``."""
+        merged = self.merge(Moments.from_frame(df, self.columns))
+        self.n, self.mean, self.m2 = merged.n, merged.mean, merged.m2
+        return self
+
+    def merge(self, *others):
+        """Statistics of the union of the observations behind ``self`` and ``others``."""
+        parts = [self, *others]
+        total, mean, m2 = _combine(np.zeros(len(parts), dtype=np.int64), 1,
+                                   np.array([p.n for p in parts]),
+                                   np.stack([p.mean for p in parts]),
+                                   np.stack([p.m2 for p in parts]))
+        return Moments(total[0], mean[0], m2[0], self.columns)
+
+    def covariance(self, ddof=1):
+        with np.errstate(invalid='ignore', divide='ignore'):
+            cov = self.m2 / (self.n - ddof)
+        return pd.DataFrame(cov, index=self.columns, columns=self.columns)
+
+    def correlation(self):
+        """Pearson correlation matrix, NaN where a column has no variance."""
+        std = np.sqrt(np.diag(self.m2))
+        with np.errstate(invalid='ignore', divide='ignore'):
+            corr = self.m2 / np.outer(std, std)
+        np.fill_diagonal(corr, np.where(std > 0, 1.0, np.nan))
+        return pd.DataFrame(np.clip(corr, -1.0, 1.0), index=self.columns, columns=self.columns)
+
+
+class CorrelationCube:
+    """Per-cell :class:`Moments` at day x region x category grain."""
+
+    def __init__(self, keys, n, mean, m2, columns=CORRELATION_COLUMNS):
+        self.keys = keys.reset_index(drop=True)
+        self.n, self.mean, self.m2 = n, mean, m2
+        self.columns = list(columns)
+        self._days = self.keys['order_date'].to_numpy()
+
+    def __len__(self):
+        return len(self.keys)
+
+    @classmethod
+    def from_frame(cls, df, columns=CORRELATION_COLUMNS):
+        df = df.dropna(subset=columns)
+        # Cells are keyed by calendar day, like the sales cube
+        grouped = df.groupby([df['order_date'].dt.normalize()] + CELL_DIMENSIONS[1:], observed=True, sort=True)
+        groups = grouped.ngroup().to_numpy()
+        keys = grouped.size().reset_index()[CELL_DIMENSIONS]
+        values = df[columns].to_numpy(dtype=float)
+        # Centre each row on its cell mean before forming the co-moments
+        n = np.bincount(groups, minlength=len(keys)).astype(float)
+        mean = np.stack([np.bincount(groups, weights=values[:, i], minlength=len(keys)) for i in range(len(columns))],
+                        axis=1) / n[:, None]
+        centered = values - mean[groups]
+        k = len(columns)
+        m2 = np.empty((len(keys), k, k))
+        for i in range(k):
+            for j in range(i, k):
+                m2[:, i, j] = m2[:, j, i] = np.bincount(groups, weights=centered[:, i] * centered[:, j],
+                                                        minlength=len(keys))
+        return cls(keys, n, mean, m2, columns)
+
+    def merge(self, *others):
+        """Cube over the union of the rows behind ``self`` and ``others``."""
+        from superstore.cube import align_categories
+
+        cubes = [self, *others]
+        keys = pd.concat(align_categories([c.keys for c in cubes], CELL_DIMENSIONS[1:]), ignore_index=True)
+        grouped = keys.groupby(CELL_DIMENSIONS, observed=True, sort=True)
+        groups = grouped.ngroup().to_numpy()
+        merged_keys = grouped.size().reset_index()[CELL_DIMENSIONS]
+        n, mean, m2 = _combine(groups, len(merged_keys),
+                               np.concatenate([c.n for c in cubes]),
+                               np.concatenate([c.mean for c in cubes]),
+                               np.concatenate([c.m2 for c in cubes]))
+        return CorrelationCube(merged_keys, n, mean, m2, self.columns)
+
+    def moments(self, start=None, end=None, region=None, category=None):
+        """Merged :class:`Moments` of the cells matching the filter."""
+        lo, hi = date_bounds(self._days, start, end)
+        keys = self.keys.iloc[lo:hi]
+        mask = np.ones(hi - lo, dtype=bool)
+        for column, value in (('region', region), ('category', category)):
+            if value is not None:
+                mask &= (keys[column] == value).to_numpy()
+        selected = np.arange(lo, hi)[mask]
+        if len(selected) == 0:
+            return Moments.empty(self.columns)
+        total, mean, m2 = _combine(np.zeros(len(selected), dtype=np.int64), 1,
+                                   self.n[selected], self.mean[selected], self.m2[selected])
+        return Moments(total[0], mean[0], m2[0], self.columns)
+
+    def correlation(self, start=None, end=None, region=None, category=None):
+        """Correlation matrix of the rows matching the filter."""
+        return self.moments(start, end, region, category).correlation()
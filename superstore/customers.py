@@ -0,0 +1,62 @@
+"""Per-customer row index and totals for Customer Sales Analytics.
+
+Each customer maps to the ascending positions of their rows in the
+date-sorted frame, so a customer's purchases in a date range are found by
+binary search without scanning or copying the rest of the data. Per-customer
+totals are computed once per dataset.
+"""
+from functools import lru_cache
+
+import numpy as np
+import pandas as pd
+
+from superstore.index import group_positions
+
+
+class CustomerIndex:
+    """Customer -> row positions, plus cached per-customer totals."""
+
+    def __init__(self, frame, dates):
+        self.frame = frame
+        self.dates = dates
+        self._codes = frame['customer'].cat.codes.to_numpy()
+        self._categories = frame['customer'].cat.categories
+        self._positions = {key[0]: positions for key, positions in group_positions(frame, ['customer']).items()}
+        self.totals = frame.groupby('customer', observed=True)[['sales', 'profit', 'quantity']].sum()
+        # Memoize rankings and customer lists; the index is immutable once built
+        self.top = lru_cache(maxsize=32)(self._top)
+        self._between = lru_cache(maxsize=64)(self._customers_between)
+
+    def __len__(self):
+        return len(self._positions)
+
+    @property
+    def count(self):
+        """Number of distinct customers in the dataset."""
+        return len(self.totals)
+
+    def _top(self, k=5, measure='profit'):
+        # Top ``k`` customers by ``measure``, with the same ordering and tie-breaking as Series.nlargest
+        return self.totals[measure].nlargest(k).reset_index()
+
+    def customers_between(self, start=None, end=None):
+        """Customers with orders in the date range, in order of first order."""
+        # Key the cache on Timestamps so dates, strings and Timestamps of one day share an entry
+        return self._between(None if start is None else pd.Timestamp(start), None if end is None else pd.Timestamp(end))
+
+    def _customers_between(self, start, end):
+        lo, hi = self.dates.bounds(start, end)
+        codes = pd.unique(self._codes[lo:hi])
+        return tuple(self._categories[codes[codes >= 0]])
+
+    def positions(self, customer, start=None, end=None):
+        """Ascending row positions of ``customer``'s orders in the date range."""
+        rows = self._positions.get(customer)
+        if rows is None:
+            return np.array([], dtype=np.int64)
+        lo, hi = self.dates.bounds(start, end)
+        return rows[np.searchsorted(rows, lo, side='left'):np.searchsorted(rows, hi, side='left')]
+
+    def rows(self, customer, start=None, end=None):
+        """``customer``'s orders in the date range, oldest first."""
+        return self.frame.iloc[self.positions(customer, start, end)]
@@ -0,0 +1,144 @@
+"""Normalized, shared representation of a Superstore dataset.
+
+Every dataset (the bundled workbook or an upload) goes through
+:func:`normalize` exactly once: ``order_date`` is parsed and the rows are
+sorted by it, the date parts the pages need are precomputed, the
+low-cardinality text columns become categoricals and integer columns are
+downcast. The result is wrapped in a :class:`Dataset` that is shared by all
+sessions; pages only read it, and anything they derive from it is memoized on
+the dataset rather than written back into the frame.
+"""
+from functools import cached_property
+
+import numpy as np
+import pandas as pd
+
+from superstore.correlation import CorrelationCube
+from superstore.cube import Cube
+from superstore.customers import CustomerIndex
+from superstore.index import DateIndex
+from superstore.ranking import ProductRanking
+from superstore.sketches import build_sketches
+from superstore.spans import span
+from superstore.timeseries import TimeSeriesStore
+
+# Text columns the pages filter and group on
+CATEGORICAL_COLUMNS = ['region', 'state', 'category', 'subcategory', 'customer', 'product_name']
+
+# Other repetitive text columns, stored as categoricals purely to save memory
+COMPACT_COLUMNS = ['segment', 'country', 'city', 'manufactory']
+
+# Columns added by normalize()
+DATE_PART_COLUMNS = ['year', 'quarter', 'month', 'week']
+
+
+def normalize(df):
+    """Return a typed copy of a raw Superstore frame.
+
+    Monetary columns (``sales``, ``profit``) and the ratio columns stay
+    float64 so totals keep their cents; only integer columns are downcast.
+    """
+    df = df.copy()
+    with span('to_datetime', rows_in=len(df)) as record:
+        df['order_date'] = pd.to_datetime(df['order_date'])
+        record.rows_out = len(df)
+    # Stable sort, so files that are already in date order keep their row order
+    df = df.sort_values('order_date', kind='stable', ignore_index=True)
+
+    for column in CATEGORICAL_COLUMNS + COMPACT_COLUMNS:
+        if column in df.columns:
+            df[column] = df[column].astype('category')
+
+    for column in df.select_dtypes(include='integer').columns:
+        df[column] = pd.to_numeric(df[column], downcast='integer')
+
+    dates = df['order_date'].dt
+    df['year'] = dates.year.astype('int16')
+    df['quarter'] = dates.quarter.astype('int8')
+    df['month'] = dates.month.astype('int8')
+    df['week'] = dates.isocalendar().week.astype('int8')
+    return df
+
+
+def is_normalized(df):
+    """Whether ``df`` already went through :func:`normalize` (e.g. read back from a sidecar)."""
+    dates = df['order_date']
+    return dates.is_monotonic_increasing and all(column in df.columns for column in DATE_PART_COLUMNS) and all(
+        isinstance(df[column].dtype, pd.CategoricalDtype)
+        for column in CATEGORICAL_COLUMNS if column in df.columns)
+
+
+class Dataset:
+    """A normalized frame plus the key that identifies its source content.
+
+    ``key`` is the content digest of the source file, so anything derived
+    from the dataset can be cached under it.
+    """
+
+    def __init__(self, frame, key):
+        self.frame = frame if is_normalized(frame) else normalize(frame)
+        self.key = key
+        self._distinct = {}
+
+    def __len__(self):
+        return len(self.frame)
+
+    @property
+    def nbytes(self):
+        return int(self.frame.memory_usage(deep=True).sum())
+
+    @cached_property
+    def cube(self):
+        """Pre-aggregated :class:`~superstore.cube.Cube` behind the page totals."""
+        return Cube.from_frame(self.frame)
+
+    @cached_property
+    def correlations(self):
+        """:class:`~superstore.correlation.CorrelationCube` for Correlation Analysis."""
+        return CorrelationCube.from_frame(self.frame)
+
+    @cached_property
+    def dates(self):
+        """:class:`~superstore.index.DateIndex` over the date-sorted frame."""
+        return DateIndex(self.frame)
+
+    @cached_property
+    def customers(self):
+        """:class:`~superstore.customers.CustomerIndex` for the customer pages."""
+        return CustomerIndex(self.frame, self.dates)
+
+    @cached_property
+    def products(self):
+        """:class:`~superstore.ranking.ProductRanking` for the product pages."""
+        return ProductRanking(self.frame, self.dates)
+
+    @cached_property
+    def timeseries(self):
+        """:class:`~superstore.timeseries.TimeSeriesStore` for Sales Trends by Seasonality."""
+        return TimeSeriesStore.from_cube(self.cube)
+
+    @cached_property
+    def sketches(self):
+        """HyperLogLog :class:`~superstore.sketches.SketchStore` per column in ``SKETCH_COLUMNS``."""
+        timeseries = self.timeseries
+        return build_sketches([self.frame], timeseries.days, timeseries.regions, timeseries.categories)
+
+    @cached_property
+    def discount_totals(self):
+        """Sales and profit per discount level over the whole dataset."""
+        return self.frame.groupby('discount')[['sales', 'profit']].sum().reset_index()
+
+    def rows(self, start=None, end=None, **filters):
+        """Rows placed on the days ``start`` through ``end`` matching ``filters``, via the date index."""
+        return self.dates.take(start, end, **filters)
+
+    def count_distinct(self, column, start=None, end=None, **filters):
+        """Exact number of distinct ``column`` values in the matching rows, via the date index."""
+        codes = self.frame[column].cat.codes.to_numpy()[self.dates.positions(start, end, **filters)]
+        return len(np.unique(codes[codes >= 0]))
+
+    def distinct(self, column):
+        """Values of ``column`` in order of first appearance, computed once."""
+        if column not in self._distinct:
+            self._distinct[column] = list(self.frame[column].unique())
+        return self._distinct[column]
@@ -0,0 +1,128 @@
+"""Plotly figure cache and payload reduction.
+
+Figures are cached as serialized JSON (or rendered image bytes) under a key made of the dataset key,
+the page and its filter state, so reruns and other sessions reuse the built
+figure instead of going through plotly express again. Long line series are
+downsampled server-side with Largest-Triangle-Three-Buckets (LTTB), and
+large traces switch to WebGL rendering.
+"""
+import json
+import threading
+from collections import OrderedDict
+
+import numpy as np
+import pandas as pd
+
+from superstore.spans import span
+
+# Line series longer than this are reduced with LTTB before plotting
+MAX_LINE_POINTS = 2000
+
+# Traces with more points than this are drawn with WebGL
+WEBGL_THRESHOLD = 1000
+
+
+def render_mode(n_points):
+    """plotly express ``render_mode`` for a trace of ``n_points`` points."""
+    return 'webgl' if n_points > WEBGL_THRESHOLD else 'svg'
+
+
+def _as_float(values):
+    values = np.asarray(values)
+    if np.issubdtype(values.dtype, np.datetime64):
+        return values.astype('datetime64[ns]').astype(np.int64).astype(float)
+    return values.astype(float)
+
+
+def lttb(x, y, n_out):
+    """Indices of the ``n_out`` points LTTB keeps from the series ``(x, y)``.
+
+    ``x`` must be sorted. The first and last points are always kept.
+    """
+    n = len(x)
+    if n_out >= n or n_out < 3:
+        return np.arange(n)
+    x, y = _as_float(x), _as_float(y)
+    kept = np.empty(n_out, dtype=np.int64)
+    kept[0], kept[-1] = 0, n - 1
+    # Bucket edges for the n - 2 interior points
+    edges = np.linspace(1, n - 1, n_out - 1).astype(np.int64)
+    a = 0
+    for i in range(n_out - 2):
+        lo, hi = edges[i], edges[i + 1]
+        # Average of the next bucket (or the last point for the final bucket)
+        next_lo, next_hi = hi, edges[i + 2] if i + 2 < len(edges) else n
+        avg_x, avg_y = x[next_lo:next_hi].mean(), y[next_lo:next_hi].mean()
+        area = np.abs((x[a] - avg_x) * (y[lo:hi] - y[a]) - (x[a] - x[lo:hi]) * (avg_y - y[a]))
+        a = lo + int(np.argmax(area))
+        kept[i + 1] = a
+    return kept
+
+
+def downsample(df, x, y, max_points=MAX_LINE_POINTS):
+    """Rows of ``df`` kept by LTTB for plotting ``y`` against ``x``.
+
+    ``y`` may name several columns; the union of the points kept for each of
+    them is returned. Frames that are short enough are returned unchanged.
+    """
+    if len(df) <= max_points:
+        return df
+    df = df.sort_values(x, kind='stable')
+    columns = [y] if isinstance(y, str) else list(y)
+    per_column = max(3, max_points // len(columns))
+    kept = np.unique(np.concatenate([lttb(df[x].to_numpy(), df[column].to_numpy(), per_column) for column in columns]))
+    return df.iloc[kept]
+
+
+def _freeze(value):
+    # Make filter values hashable and stable across reruns
+    if isinstance(value, (list, tuple)):
+        return tuple(_freeze(v) for v in value)
+    if isinstance(value, pd.Timestamp):
+        return value.isoformat()
+    return value
+
+
+class FigureCache:
+    """Process-wide LRU of serialized figures."""
+
+    def __init__(self, max_entries=256):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def get_or_build(self, key, build):
+        """Figure JSON for ``key``, calling ``build()`` for a figure on a miss."""
+        key = _freeze(key)
+        with self._lock:
+            if key in self._entries:
+                self._entries.move_to_end(key)
+                return self._entries[key]
+        fig = build()
+        with span('figure_json'):
+            fig_json = fig.to_json()
+        with self._lock:
+            self._entries[key] = fig_json
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        return fig_json
+
+    def figure(self, key, build):
+        """Like :meth:`get_or_build`, returned as a figure dict for ``st.plotly_chart``."""
+        return json.loads(self.get_or_build(key, build))
+
+    def image(self, key, render):
+        """Cached image bytes for ``key``, calling ``render()`` on a miss."""
+        return self.get_or_build(('image',) + tuple(key), lambda: _Rendered(render()))
+
+
+class _Rendered:
+    # Lets pre-rendered payloads (e.g. PNG bytes) share the figure LRU
+    def __init__(self, payload):
+        self.payload = payload
+
+    def to_json(self):
+        return self.payload
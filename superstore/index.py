@@ -0,0 +1,101 @@
+"""Sorted date index with per-group row ranges.
+
+The normalized frame is kept sorted by ``order_date``, so a date range is a
+contiguous block of rows found by binary search and served as a positional
+slice. For each filterable group (a region, a category, or a combination of
+them) the index also keeps the ascending row positions of that group; since
+positions follow date order, a date range within a group is again found by
+binary search and only rows of the result are touched.
+
+Date ranges are whole calendar days everywhere (here, in the cube and in
+every store derived from it): ``start`` and ``end`` are reduced to their day
+and ``end`` includes every order placed on that day, whatever its time.
+"""
+import numpy as np
+import pandas as pd
+
+# Columns that can be combined with a date range
+GROUP_COLUMNS = ('region', 'category')
+
+
+def _day(value):
+    return pd.Timestamp(value).normalize().to_datetime64()
+
+
+def date_bounds(days, start=None, end=None):
+    """Range ``[lo, hi)`` of the sorted datetime64 array ``days`` falling on the days ``start`` through ``end``."""
+    lo = 0 if start is None else int(np.searchsorted(days, _day(start), side='left'))
+    hi = len(days) if end is None else int(np.searchsorted(days, _day(end) + np.timedelta64(1, 'D'), side='left'))
+    return lo, max(lo, hi)
+
+
+def group_positions(frame, columns):
+    """Map each observed combination of ``columns`` to its ascending row positions."""
+    # Shift codes by one so missing values (code -1) get their own slot
+    codes = [frame[column].cat.codes.to_numpy().astype(np.int64) + 1 for column in columns]
+    key = codes[0]
+    for column, column_codes in zip(columns[1:], codes[1:]):
+        key = key * (len(frame[column].cat.categories) + 1) + column_codes
+    order = np.argsort(key, kind='stable')
+    sorted_keys = key[order]
+    starts = np.flatnonzero(np.r_[True, sorted_keys[1:] != sorted_keys[:-1]]) if len(key) else np.array([], dtype=np.int64)
+    first = order[starts]
+    values = zip(*(frame[column].iloc[first].to_numpy() for column in columns))
+    return dict(zip(values, np.split(order, starts[1:])))
+
+
+class DateIndex:
+    """Binary-search index over a frame sorted by ``order_date``."""
+
+    def __init__(self, frame, group_columns=GROUP_COLUMNS):
+        days = frame['order_date'].to_numpy()
+        if len(days) > 1 and (days[1:] < days[:-1]).any():
+            raise ValueError("DateIndex needs a frame sorted by order_date")
+        self.frame = frame
+        self.group_columns = tuple(group_columns)
+        self._days = days
+        self._groups = {}
+
+    def __len__(self):
+        return len(self._days)
+
+    @property
+    def min_date(self):
+        return pd.Timestamp(self._days[0])
+
+    @property
+    def max_date(self):
+        return pd.Timestamp(self._days[-1])
+
+    def bounds(self, start=None, end=None):
+        """Row range ``[lo, hi)`` of the orders placed on the days ``start`` through ``end``."""
+        return date_bounds(self._days, start, end)
+
+    def _positions_for(self, columns):
+        # Built lazily, once per combination of group columns
+        if columns not in self._groups:
+            self._groups[columns] = group_positions(self.frame, list(columns))
+        return self._groups[columns]
+
+    def positions(self, start=None, end=None, **filters):
+        """Rows in the date range matching ``filters``.
+
+        Returns a ``slice`` when no group filter is active, otherwise an
+        ascending array of row positions. ``None`` filter values are ignored.
+        """
+        lo, hi = self.bounds(start, end)
+        active = {column: value for column, value in filters.items() if value is not None}
+        if not active:
+            return slice(lo, hi)
+        unknown = set(active) - set(self.group_columns)
+        if unknown:
+            raise KeyError(f"not an indexed group column: {', '.join(sorted(unknown))}")
+        columns = tuple(column for column in self.group_columns if column in active)
+        group = self._positions_for(columns).get(tuple(active[column] for column in columns))
+        if group is None:
+            return np.array([], dtype=np.int64)
+        return group[np.searchsorted(group, lo, side='left'):np.searchsorted(group, hi, side='left')]
+
+    def take(self, start=None, end=None, **filters):
+        """The matching rows of the indexed frame (a view for pure date ranges)."""
+        return self.frame.iloc[self.positions(start, end, **filters)]
@@ -0,0 +1,153 @@
+"""Cached ingestion of uploaded order files.
+
+Uploads (``.xlsx``, ``.csv`` or ``.parquet``) are identified by the SHA-256
+digest of their bytes, parsed once through :mod:`superstore.readers`,
+normalized, and kept in a bounded LRU shared by all sessions of the process.
+Eviction is driven by the in-memory size of the datasets rather than the
+number of entries, so a few 200 MB regional exports cannot pin the worker's
+memory. Uploads too large to hold at all can be spilled to an out-of-core
+store (see :mod:`superstore.outofcore`). Spilled stores are kept in a
+directory bounded by its own disk budget, evicting the least recently used
+store first.
+"""
+import hashlib
+import os
+import shutil
+import threading
+from collections import OrderedDict
+
+from superstore.dataset import Dataset
+from superstore.readers import read_source
+from superstore.spans import span
+
+
+def content_digest(data):
+    """SHA-256 hex digest of an uploaded file's bytes."""
+    return hashlib.sha256(data).hexdigest()
+
+
+def read_upload(data, fmt='xlsx', progress=None):
+    """Parse an uploaded ``.xlsx``, ``.csv`` or ``.parquet`` payload into one frame."""
+    with span('parse', detail='upload') as record:
+        frame = read_source(data, fmt=fmt, progress=progress)
+        record.rows_out = len(frame)
+    return frame
+
+
+def _touch(path):
+    try:
+        os.utime(path)
+    except OSError:
+        pass
+
+
+def _disk_usage(path):
+    total = 0
+    for directory, _, files in os.walk(path):
+        for name in files:
+            try:
+                total += os.path.getsize(os.path.join(directory, name))
+            except OSError:
+                pass
+    return total
+
+
+class UploadCache:
+    """Process-wide LRU of uploaded datasets, bounded by their total size."""
+
+    def __init__(self, max_bytes, spill_bytes=None, spill_dir=None, spill_max_bytes=None):
+        self.max_bytes = max_bytes
+        # Payloads above spill_bytes are streamed into an out-of-core store under spill_dir,
+        # which holds at most spill_max_bytes of stores (unbounded when None)
+        self.spill_bytes = spill_bytes
+        self.spill_dir = spill_dir
+        self.spill_max_bytes = spill_max_bytes
+        self._entries = OrderedDict()
+        self._nbytes = 0
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._entries)
+
+    @property
+    def nbytes(self):
+        return self._nbytes
+
+    def get(self, digest):
+        with self._lock:
+            entry = self._entries.get(digest)
+            if entry is None:
+                return None
+            self._entries.move_to_end(digest)
+        dataset = entry[0]
+        if getattr(dataset, 'root', None) is not None:
+            _touch(dataset.root)
+        return dataset
+
+    def put(self, dataset):
+        digest = dataset.key
+        size = dataset.nbytes
+        with self._lock:
+            if digest in self._entries:
+                self._nbytes -= self._entries.pop(digest)[1]
+            self._entries[digest] = (dataset, size)
+            self._nbytes += size
+            # Evict least recently used uploads, but always keep the newest one
+            while self._nbytes > self.max_bytes and len(self._entries) > 1:
+                _, (_, evicted) = self._entries.popitem(last=False)
+                self._nbytes -= evicted
+
+    def _spill(self, data, digest, fmt, progress):
+        from superstore.outofcore import open_or_build
+
+        root = os.path.join(self.spill_dir, digest)
+        dataset = open_or_build(data, root, fmt=fmt, key=digest, progress=progress)
+        _touch(root)
+        self.prune_spill(keep=digest)
+        return dataset
+
+    def prune_spill(self, keep=None):
+        """Delete the least recently used spilled stores until they fit in ``spill_max_bytes``.
+
+        Recency is the store directory's mtime, refreshed whenever the store
+        is served, so the budget holds across every process sharing
+        ``spill_dir``. The store named ``keep`` is never deleted.
+        """
+        if self.spill_max_bytes is None or not os.path.isdir(self.spill_dir):
+            return
+        stores = []
+        for entry in os.scandir(self.spill_dir):
+            # Skip stores still being assembled by build_store
+            if entry.is_dir() and '.tmp-' not in entry.name:
+                stores.append((entry.stat().st_mtime, entry.name, _disk_usage(entry.path)))
+        total = sum(size for _, _, size in stores)
+        for _, name, size in sorted(stores):
+            if total <= self.spill_max_bytes:
+                break
+            if name == keep:
+                continue
+            with self._lock:
+                entry = self._entries.pop(name, None)
+                if entry is not None:
+                    self._nbytes -= entry[1]
+            shutil.rmtree(os.path.join(self.spill_dir, name), ignore_errors=True)
+            total -= size
+
+    def get_or_parse(self, data, fmt='xlsx', progress=None, digest=None):
+        """Return the :class:`Dataset` for ``data`` (a ``fmt`` payload), parsing it on a miss.
+
+        Payloads larger than ``spill_bytes`` become a
+        :class:`~superstore.outofcore.ChunkedDataset` instead, so they are
+        never held in memory as a whole. Pass ``digest`` when it is already
+        known to skip hashing ``data``.
+        """
+        if digest is None:
+            digest = content_digest(data)
+        dataset = self.get(digest)
+        if dataset is None:
+            if self.spill_bytes is not None and len(data) > self.spill_bytes:
+                dataset = self._spill(data, digest, fmt, progress)
+            else:
+                dataset = Dataset(read_upload(data, fmt, progress=progress), key=digest)
+            self.put(dataset)
+        return dataset
@@ -0,0 +1,699 @@
+"""Out-of-core mode for datasets larger than memory.
+
+:func:`build_store` streams a source file (``.xlsx``, ``.csv`` or
+``.parquet``, through :func:`~superstore.readers.iter_source`) in chunks
+sized from a memory budget, writes the raw rows to
+Parquet partitioned by order month and folds every chunk into the same
+mergeable aggregates the in-memory :class:`~superstore.dataset.Dataset`
+builds from its whole frame: the sales :class:`~superstore.cube.Cube`, the
+:class:`~superstore.correlation.CorrelationCube`, per-customer and
+per-product, per-discount totals, the sparse cells of the distinct-count
+sketches (:mod:`superstore.sketches`) and the first appearance of the
+filterable values. Their size depends on the number of distinct keys, not on
+the number of rows, so only one chunk of rows is ever held in memory.
+
+A store directory looks like::
+
+    STORE/manifest.json
+    STORE/data/year=2014/month=01/part-00000.parquet
+    STORE/aggregates/00000/cube.parquet, correlation.parquet, customers.parquet, sketch_customer.parquet, ...
+
+:func:`append_store` adds a new file (say, next month's orders) to a store:
+rows already stored are skipped, and only the new rows and the month
+partitions they overlap are read.
+
+:class:`ChunkedDataset` answers every :mod:`superstore.analytics` function
+from a store. Totals come from the aggregates; the views that need rows (a
+customer's purchases, customers and product rankings for a date range) read
+only the month partitions the range touches. Results match the in-memory
+path, up to the order in which floating-point partial sums are added.
+
+Usage::
+
+    python -m superstore.outofcore SOURCE STORE [--append] [--memory-budget 512MB] [--reports OUTPUT_DIR]
+"""
+import argparse
+import hashlib
+import json
+import os
+import shutil
+import sys
+import tempfile
+import threading
+import time
+from collections import OrderedDict
+from functools import cached_property, lru_cache
+
+import numpy as np
+import pandas as pd
+
+from superstore.correlation import CELL_DIMENSIONS, CorrelationCube
+from superstore.cube import DIMENSIONS, Cube, align_categories
+from superstore.dataset import CATEGORICAL_COLUMNS, normalize
+from superstore.index import date_bounds
+from superstore.ranking import rank_totals
+from superstore.readers import iter_source
+from superstore.sketches import SKETCH_COLUMNS, SketchStore, cell_ranks, merge_cell_ranks
+from superstore.timeseries import TimeSeriesStore
+
+STORE_VERSION = 2
+
+MEMORY_BUDGET_ENV = 'SUPERSTORE_MEMORY_BUDGET'
+DEFAULT_MEMORY_BUDGET = 512 * 1024 ** 2
+
+# Rough peak memory per row while a chunk is parsed, normalized and aggregated
+ROW_BYTES = 2048
+MIN_CHUNK_ROWS = 1_000
+
+# Partial aggregates are merged in batches rather than after every chunk
+MERGE_EVERY = 16
+
+# Columns whose values are offered as filters, in order of first appearance
+DISTINCT_COLUMNS = ['region', 'state', 'category', 'subcategory']
+
+CUSTOMER_MEASURES = ['sales', 'profit', 'quantity']
+PRODUCT_MEASURES = ['sales', 'profit', 'quantity']
+
+
+def parse_bytes(text):
+    """Byte count for ``'512MB'``, ``'2G'``, ``'1048576'`` etc."""
+    text = str(text).strip().lower().replace('_', '').rstrip('b')
+    for suffix, factor in (('k', 1024), ('m', 1024 ** 2), ('g', 1024 ** 3)):
+        if text.endswith(suffix):
+            return int(float(text[:-len(suffix)]) * factor)
+    return int(text)
+
+
+def memory_budget(budget=None):
+    """The memory budget in bytes: ``budget``, else ``$SUPERSTORE_MEMORY_BUDGET``, else 512 MB."""
+    if budget is None:
+        budget = os.environ.get(MEMORY_BUDGET_ENV) or DEFAULT_MEMORY_BUDGET
+    return parse_bytes(budget)
+
+
+def chunk_rows_for(budget):
+    """Rows per chunk that keep one chunk's working set within ``budget`` bytes."""
+    return max(MIN_CHUNK_ROWS, memory_budget(budget) // ROW_BYTES)
+
+
+def _arrow_schema(chunk):
+    # Widen numeric columns so later chunks with larger values still fit
+    import pyarrow as pa
+
+    schema = pa.Schema.from_pandas(chunk, preserve_index=False)
+    fields = []
+    for field in schema:
+        if pa.types.is_integer(field.type):
+            field = field.with_type(pa.int64())
+        elif pa.types.is_floating(field.type):
+            field = field.with_type(pa.float64())
+        fields.append(field)
+    return pa.schema(fields)
+
+
+def _first_seen(chunk, offset):
+    # First (order_date, source row) of each value in DISTINCT_COLUMNS, as normalize() would order them
+    order = np.argsort(chunk['order_date'].to_numpy(), kind='stable')
+    dates = chunk['order_date'].to_numpy()[order]
+    frames = []
+    for column in DISTINCT_COLUMNS:
+        values = pd.Series(chunk[column].to_numpy()[order]).dropna().drop_duplicates()
+        picked = values.index.to_numpy()
+        frames.append(pd.DataFrame({'column': column, 'value': values.astype(str).to_numpy(),
+                                    'first_date': dates[picked], 'first_row': order[picked] + offset}))
+    return pd.concat(frames, ignore_index=True)
+
+
+def _merge_first_seen(frames):
+    seen = pd.concat(frames, ignore_index=True).sort_values(['first_date', 'first_row'], kind='stable')
+    return seen.drop_duplicates(['column', 'value']).reset_index(drop=True)
+
+
+def _partial_sum(frame, key, measures):
+    # Partials are keyed by plain values: re-aligning large categoricals on every merge costs more than the sums
+    partial = frame.groupby(key, observed=True)[measures].sum().reset_index()
+    if isinstance(partial[key].dtype, pd.CategoricalDtype):
+        partial[key] = partial[key].astype(partial[key].cat.categories.dtype)
+    return partial
+
+
+def _sum_by(key, measures):
+    def merge(frames):
+        return pd.concat(frames, ignore_index=True).groupby(key, sort=True)[measures].sum().reset_index()
+    return merge
+
+
+class _Partials:
+    """Running merge of per-chunk partial aggregates."""
+
+    def __init__(self, merge):
+        self._merge = merge
+        self._pending = []
+
+    def add(self, part):
+        self._pending.append(part)
+        if len(self._pending) >= MERGE_EVERY:
+            self._pending = [self._merge(self._pending)]
+
+    def result(self):
+        if not self._pending:
+            return None
+        if len(self._pending) > 1:
+            self._pending = [self._merge(self._pending)]
+        return self._pending[0]
+
+
+def _partition_dir(root, year, month):
+    return os.path.join(root, 'data', f'year={year:04d}', f'month={month:02d}')
+
+
+def _source_key(source):
+    if isinstance(source, (bytes, bytearray)):
+        from superstore.ingest import content_digest
+        return content_digest(source)
+    from superstore.cache import file_digest
+    return file_digest(source)
+
+
+def _conform(chunk, schema):
+    # Parse dates and round-trip through the store's schema, so rows compare equal to the ones read back
+    import pyarrow as pa
+
+    chunk = chunk.assign(order_date=pd.to_datetime(chunk['order_date']))
+    if schema is None:
+        schema = _arrow_schema(chunk)
+    try:
+        table = pa.Table.from_pandas(chunk, schema=schema, preserve_index=False)
+    except (KeyError, pa.ArrowException) as exc:
+        raise ValueError(f"rows do not match the store's columns: {exc}") from exc
+    return table.to_pandas(), schema
+
+
+def _month_keys(chunk):
+    dates = chunk['order_date']
+    return (dates.dt.year * 100 + dates.dt.month).to_numpy()
+
+
+def _write_partitions(root, chunk, number, schema):
+    # Rows keep their source order inside each part file; returns {partition: (rows, file name)}
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    keys = _month_keys(chunk)
+    written = {}
+    for key in np.unique(keys):
+        part = chunk[keys == key]
+        year, month = divmod(int(key), 100)
+        target = _partition_dir(root, year, month)
+        os.makedirs(target, exist_ok=True)
+        name = f'part-{number:05d}.parquet'
+        pq.write_table(pa.Table.from_pandas(part, schema=schema, preserve_index=False), os.path.join(target, name))
+        written[f'{year:04d}-{month:02d}'] = (len(part), name)
+    return written
+
+
+class _Aggregates:
+    """Every stored aggregate, accumulated chunk by chunk."""
+
+    def __init__(self):
+        self.cube = _Partials(lambda parts: parts[0].merge(*parts[1:]))
+        self.correlations = _Partials(lambda parts: parts[0].merge(*parts[1:]))
+        self.customers = _Partials(_sum_by('customer', CUSTOMER_MEASURES))
+        self.products = _Partials(_sum_by('product_name', PRODUCT_MEASURES))
+        self.discounts = _Partials(_sum_by('discount', ['sales', 'profit']))
+        self.first_seen = _Partials(_merge_first_seen)
+        self.sketches = {column: _Partials(merge_cell_ranks) for column in SKETCH_COLUMNS}
+
+    @classmethod
+    def of(cls, dataset):
+        """Accumulator seeded with the aggregates of an existing store."""
+        aggregates = cls()
+        aggregates.cube.add(dataset.cube)
+        aggregates.correlations.add(dataset.correlations)
+        aggregates.customers.add(dataset._aggregate('customers.parquet'))
+        aggregates.products.add(dataset._aggregate('products.parquet'))
+        aggregates.discounts.add(dataset.discount_totals)
+        aggregates.first_seen.add(dataset._aggregate('first_seen.parquet'))
+        for column in SKETCH_COLUMNS:
+            aggregates.sketches[column].add(dataset.sketch_cells(column))
+        return aggregates
+
+    def add(self, chunk, offset):
+        """Fold a conformed chunk whose first row is row ``offset`` of the source order."""
+        self.first_seen.add(_first_seen(chunk, offset))
+        frame = normalize(chunk)
+        self.cube.add(Cube.from_frame(frame))
+        self.correlations.add(CorrelationCube.from_frame(frame))
+        self.customers.add(_partial_sum(frame, 'customer', CUSTOMER_MEASURES))
+        self.products.add(_partial_sum(frame, 'product_name', PRODUCT_MEASURES))
+        self.discounts.add(_partial_sum(frame, 'discount', ['sales', 'profit']))
+        for column in SKETCH_COLUMNS:
+            self.sketches[column].add(cell_ranks(frame, column))
+
+    def write(self, target):
+        """Write the merged aggregates to ``target`` and return the merged cube."""
+        os.makedirs(target, exist_ok=True)
+        cube, correlations = self.cube.result(), self.correlations.result()
+        cube.cells.to_parquet(os.path.join(target, 'cube.parquet'), index=False)
+        correlations.keys.to_parquet(os.path.join(target, 'correlation.parquet'), index=False)
+        np.savez(os.path.join(target, 'correlation.npz'), n=correlations.n, mean=correlations.mean,
+                 m2=correlations.m2)
+        self.customers.result().to_parquet(os.path.join(target, 'customers.parquet'), index=False)
+        self.products.result().to_parquet(os.path.join(target, 'products.parquet'), index=False)
+        self.discounts.result().to_parquet(os.path.join(target, 'discounts.parquet'), index=False)
+        self.first_seen.result().to_parquet(os.path.join(target, 'first_seen.parquet'), index=False)
+        for column in SKETCH_COLUMNS:
+            self.sketches[column].result().to_parquet(os.path.join(target, f'sketch_{column}.parquet'), index=False)
+        return cube
+
+
+def _aggregates_dir(generation):
+    return os.path.join('aggregates', f'{generation:05d}')
+
+
+def _manifest(key, sources, rows, cube, partitions, next_part, generation):
+    return {
+        'version': STORE_VERSION,
+        'key': key,
+        'sources': sources,
+        'rows': rows,
+        'min_date': str(cube.cells['order_date'].iloc[0]),
+        'max_date': str(cube.cells['order_date'].iloc[-1]),
+        'partitions': dict(sorted(partitions.items())),
+        'next_part': next_part,
+        'aggregates': _aggregates_dir(generation),
+        'generation': generation,
+    }
+
+
+def _write_manifest(root, manifest):
+    from superstore.cache import _write_atomic
+
+    def write(tmp):
+        with open(tmp, 'w') as fh:
+            json.dump(manifest, fh, indent=2)
+    _write_atomic(os.path.join(root, 'manifest.json'), write)
+
+
+def build_store(source, root, fmt=None, budget=None, key=None, progress=None):
+    """Stream ``source`` into a partitioned store at ``root`` and return its :class:`ChunkedDataset`.
+
+    ``source`` is a path or the file's bytes (then ``fmt`` names its format).
+    The store is assembled next to ``root`` and moved into place when it is
+    complete, replacing any previous store there.
+    """
+    key = key or _source_key(source)
+    chunk_rows = chunk_rows_for(budget)
+    root = os.path.abspath(root)
+    os.makedirs(os.path.dirname(root), exist_ok=True)
+    staging = tempfile.mkdtemp(dir=os.path.dirname(root), prefix=os.path.basename(root) + '.tmp-')
+    try:
+        aggregates = _Aggregates()
+        partitions = {}
+        schema = None
+        rows = number = 0
+        for number, chunk in enumerate(iter_source(source, chunk_rows, fmt, progress=progress), start=1):
+            chunk, schema = _conform(chunk, schema)
+            for name, (count, part) in _write_partitions(staging, chunk, number - 1, schema).items():
+                entry = partitions.setdefault(name, {'rows': 0, 'files': []})
+                entry['rows'] += count
+                entry['files'].append(part)
+            aggregates.add(chunk, rows)
+            rows += len(chunk)
+        if rows == 0:
+            raise ValueError("the source has no rows")
+        cube = aggregates.write(os.path.join(staging, _aggregates_dir(0)))
+        _write_manifest(staging, _manifest(key, [key], rows, cube, partitions, number, 0))
+        if os.path.exists(root):
+            shutil.rmtree(root)
+        os.replace(staging, root)
+    except BaseException:
+        shutil.rmtree(staging, ignore_errors=True)
+        raise
+    return ChunkedDataset(root)
+
+
+class _Deduplicator:
+    """Drops incoming rows that already exist in the store's overlapping month partitions.
+
+    Rows are compared on every column. Duplicates are matched as a multiset:
+    a row stored ``n`` times only has its first ``n`` incoming copies
+    dropped, so identical order lines that genuinely repeat are kept.
+    """
+
+    def __init__(self, dataset):
+        self.dataset = dataset
+        self._remaining = pd.Series(dtype=np.int64)
+        self._loaded = set()
+
+    def _load(self, months):
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+
+        for month in months:
+            name = f'{month // 100:04d}-{month % 100:02d}'
+            if month in self._loaded or name not in self.dataset.manifest['partitions']:
+                continue
+            self._loaded.add(month)
+            directory = _partition_dir(self.dataset.root, month // 100, month % 100)
+            files = self.dataset.manifest['partitions'][name]['files']
+            frame = pa.concat_tables([pq.read_table(os.path.join(directory, f)) for f in files]).to_pandas()
+            counts = pd.Series(pd.util.hash_pandas_object(frame, index=False).to_numpy()).value_counts()
+            self._remaining = counts if self._remaining.empty else self._remaining.add(counts, fill_value=0)
+
+    def new_rows(self, chunk):
+        """The rows of ``chunk`` not already in the store, in their original order."""
+        self._load(np.unique(_month_keys(chunk)))
+        if self._remaining.empty:
+            return chunk
+        hashes = pd.Series(pd.util.hash_pandas_object(chunk, index=False).to_numpy())
+        occurrence = hashes.groupby(hashes).cumcount().to_numpy()
+        stored = self._remaining.reindex(hashes).fillna(0).to_numpy()
+        duplicate = occurrence < stored
+        used = hashes[duplicate].value_counts()
+        self._remaining = self._remaining.sub(used, fill_value=0)
+        return chunk[~duplicate]
+
+
+def append_store(source, root, fmt=None, budget=None, key=None, progress=None):
+    """Add the rows of ``source`` to the store at ``root`` and return the refreshed :class:`ChunkedDataset`.
+
+    Rows already in the store are skipped (see :class:`_Deduplicator`), the
+    remaining ones are written as new part files of their month partitions
+    and folded into the stored aggregates. Only the delta and the month
+    partitions it overlaps are read, so the cost follows the size of the new
+    file rather than the history. Appending the same content twice is a
+    no-op. If there is no store yet, it is built from ``source``.
+    """
+    dataset = open_store(root)
+    if dataset is None:
+        return build_store(source, root, fmt=fmt, budget=budget, key=key, progress=progress)
+    key = key or _source_key(source)
+    manifest = dataset.manifest
+    if key in manifest['sources']:
+        return dataset
+
+    import pyarrow.parquet as pq
+
+    first = next(iter(manifest['partitions'].items()))
+    year, month = (int(part) for part in first[0].split('-'))
+    schema = pq.read_schema(os.path.join(_partition_dir(root, year, month), first[1]['files'][0]))
+
+    aggregates = _Aggregates.of(dataset)
+    deduplicator = _Deduplicator(dataset)
+    partitions = {name: {'rows': entry['rows'], 'files': list(entry['files'])}
+                  for name, entry in manifest['partitions'].items()}
+    rows, number = manifest['rows'], manifest['next_part']
+    for chunk in iter_source(source, chunk_rows_for(budget), fmt, progress=progress):
+        chunk = deduplicator.new_rows(_conform(chunk, schema)[0])
+        if len(chunk) == 0:
+            continue
+        for name, (count, part) in _write_partitions(root, chunk, number, schema).items():
+            entry = partitions.setdefault(name, {'rows': 0, 'files': []})
+            entry['rows'] += count
+            entry['files'].append(part)
+        aggregates.add(chunk, rows)
+        rows += len(chunk)
+        number += 1
+
+    # New part files are invisible until the manifest that lists them replaces the old one
+    generation = manifest['generation'] + 1
+    cube = aggregates.write(os.path.join(root, _aggregates_dir(generation)))
+    combined = hashlib.sha256(f"{manifest['key']}+{key}".encode()).hexdigest()
+    _write_manifest(root, _manifest(combined, manifest['sources'] + [key], rows, cube, partitions, number,
+                                    generation))
+    # Keep the previous generation for readers that opened the store before the swap
+    shutil.rmtree(os.path.join(root, _aggregates_dir(generation - 2)), ignore_errors=True)
+    return ChunkedDataset(root)
+
+
+def open_store(root):
+    """The :class:`ChunkedDataset` of an existing store, or ``None`` if there is none at ``root``."""
+    try:
+        with open(os.path.join(root, 'manifest.json')) as fh:
+            manifest = json.load(fh)
+    except (OSError, ValueError):
+        return None
+    if manifest.get('version') != STORE_VERSION:
+        return None
+    return ChunkedDataset(root, manifest)
+
+
+def store_key(root):
+    """Key of the store at ``root`` (it changes with every append), or ``None`` if there is no store."""
+    dataset = open_store(root)
+    return None if dataset is None else dataset.key
+
+
+def open_or_build(source, root, fmt=None, budget=None, key=None, progress=None):
+    """Reuse the store at ``root`` if it was built from the same content, else build it."""
+    dataset = open_store(root)
+    if dataset is not None and (key is None or dataset.key == key):
+        return dataset
+    return build_store(source, root, fmt=fmt, budget=budget, key=key, progress=progress)
+
+
+class StoreDates:
+    """First and last order date of a store (the part of DateIndex the pages use)."""
+
+    def __init__(self, min_date, max_date):
+        self.min_date = min_date
+        self.max_date = max_date
+
+
+class ChunkedDataset:
+    """A :class:`~superstore.dataset.Dataset` look-alike backed by an on-disk store."""
+
+    def __init__(self, root, manifest=None):
+        self.root = root
+        if manifest is None:
+            with open(os.path.join(root, 'manifest.json')) as fh:
+                manifest = json.load(fh)
+        self.manifest = manifest
+        self.key = manifest['key']
+        self.dates = StoreDates(pd.Timestamp(manifest['min_date']), pd.Timestamp(manifest['max_date']))
+        # Row offset of each month partition in the date-sorted order
+        partitions = list(manifest['partitions'].items())
+        offsets = np.concatenate([[0], np.cumsum([entry['rows'] for _, entry in partitions])])
+        self._partitions = [(name, entry['files'], int(offset)) for (name, entry), offset in zip(partitions, offsets)]
+        self._distinct = {}
+
+    def __len__(self):
+        return self.manifest['rows']
+
+    def _aggregate(self, name):
+        return pd.read_parquet(os.path.join(self.root, self.manifest['aggregates'], name))
+
+    @property
+    def nbytes(self):
+        return sum(int(frame.memory_usage(deep=True).sum())
+                   for frame in (self.cube.cells, self.customers.totals, self.discount_totals))
+
+    @cached_property
+    def cube(self):
+        cells = self._aggregate('cube.parquet')
+        return Cube(align_categories([cells], DIMENSIONS[1:])[0])
+
+    @cached_property
+    def correlations(self):
+        keys = align_categories([self._aggregate('correlation.parquet')], CELL_DIMENSIONS[1:])[0]
+        with np.load(os.path.join(self.root, self.manifest['aggregates'], 'correlation.npz')) as arrays:
+            return CorrelationCube(keys, arrays['n'], arrays['mean'], arrays['m2'])
+
+    @cached_property
+    def timeseries(self):
+        return TimeSeriesStore.from_cube(self.cube)
+
+    def sketch_cells(self, column):
+        """Stored :func:`~superstore.sketches.cell_ranks` of ``column``.
+
+        Stores written before the sketches were kept as aggregates get them
+        from one pass over the partitions instead.
+        """
+        path = os.path.join(self.root, self.manifest['aggregates'], f'sketch_{column}.parquet')
+        if os.path.exists(path):
+            return pd.read_parquet(path)
+        frames = self.scan(columns=['region', 'category', column], normalized=False)
+        return merge_cell_ranks([cell_ranks(frame, column) for frame in frames])
+
+    @cached_property
+    def sketches(self):
+        timeseries = self.timeseries
+        return {column: SketchStore.from_cells(self.sketch_cells(column), timeseries.days, timeseries.regions,
+                                               timeseries.categories)
+                for column in SKETCH_COLUMNS}
+
+    @cached_property
+    def discount_totals(self):
+        return self._aggregate('discounts.parquet')
+
+    @cached_property
+    def product_totals(self):
+        return self._aggregate('products.parquet')[['product_name', 'sales', 'profit']]
+
+    @cached_property
+    def customers(self):
+        return ChunkedCustomers(self)
+
+    @cached_property
+    def products(self):
+        return ChunkedProducts(self)
+
+    def distinct(self, column):
+        """Values of ``column`` in order of first appearance."""
+        if column not in DISTINCT_COLUMNS:
+            raise KeyError(f"{column!r} values are not tracked by the store")
+        if column not in self._distinct:
+            seen = self._aggregate('first_seen.parquet')
+            self._distinct[column] = list(seen.loc[seen['column'] == column, 'value'])
+        return self._distinct[column]
+
+    def scan(self, start=None, end=None, columns=None, normalized=True, **filters):
+        """Yield the rows of the days ``start`` through ``end`` matching ``filters``, one month partition at a time.
+
+        Frames are in date order and indexed by the rows' positions in the
+        date-sorted dataset. Filters are applied to the raw partition, so only
+        the selected rows are normalized (or none, with ``normalized=False``).
+        """
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+
+        start = None if start is None else pd.Timestamp(start)
+        end = None if end is None else pd.Timestamp(end)
+        if columns is not None:
+            columns = list(dict.fromkeys(['order_date', *columns, *filters]))
+        for name, files, offset in self._partitions:
+            year, month = (int(part) for part in name.split('-'))
+            first = pd.Timestamp(year=year, month=month, day=1)
+            if (end is not None and first > end) or (start is not None and first + pd.offsets.MonthBegin() <= start):
+                continue
+            directory = _partition_dir(self.root, year, month)
+            frame = pa.concat_tables([pq.read_table(os.path.join(directory, f), columns=columns)
+                                      for f in files]).to_pandas()
+            # Part files hold rows in source order, so a stable sort gives normalize()'s order
+            frame = frame.take(np.argsort(frame['order_date'].to_numpy(), kind='stable'))
+            frame.index = pd.RangeIndex(offset, offset + len(frame))
+            lo, hi = date_bounds(frame['order_date'].to_numpy(), start, end)
+            frame = frame.iloc[lo:hi]
+            for column, value in filters.items():
+                if value is not None:
+                    frame = frame[frame[column] == value]
+            if len(frame) == 0:
+                continue
+            if normalized:
+                index = frame.index
+                frame = normalize(frame)
+                frame.index = index
+            yield frame
+
+    def count_distinct(self, column, start=None, end=None, **filters):
+        """Exact number of distinct ``column`` values in the matching rows, read one partition at a time."""
+        values = [pd.unique(frame[column].dropna().to_numpy())
+                  for frame in self.scan(start, end, columns=[column], normalized=False, **filters)]
+        return len(pd.unique(np.concatenate(values))) if values else 0
+
+    def rows(self, start=None, end=None, **filters):
+        """Rows placed on the days ``start`` through ``end`` matching ``filters`` (read into memory)."""
+        parts = list(self.scan(start, end, **filters))
+        if not parts:
+            return next(self.scan()).iloc[:0]
+        columns = [column for column in CATEGORICAL_COLUMNS if column in parts[0].columns]
+        return pd.concat(align_categories(parts, columns))
+
+
+class ChunkedCustomers:
+    """The :class:`~superstore.customers.CustomerIndex` interface over a store."""
+
+    def __init__(self, dataset):
+        self.dataset = dataset
+        totals = dataset._aggregate('customers.parquet')
+        self.totals = totals.set_index(pd.CategoricalIndex(totals.pop('customer'), name='customer'))
+        self.top = lru_cache(maxsize=32)(self._top)
+        self._between = lru_cache(maxsize=64)(self._customers_between)
+
+    def __len__(self):
+        return len(self.totals)
+
+    @property
+    def count(self):
+        return len(self.totals)
+
+    def _top(self, k=5, measure='profit'):
+        return self.totals[measure].nlargest(k).reset_index()
+
+    def customers_between(self, start=None, end=None):
+        return self._between(None if start is None else pd.Timestamp(start), None if end is None else pd.Timestamp(end))
+
+    def _customers_between(self, start, end):
+        seen = {}
+        for frame in self.dataset.scan(start, end, ['customer'], normalized=False):
+            seen.update(dict.fromkeys(frame['customer'].unique()))
+        return tuple(seen)
+
+    def rows(self, customer, start=None, end=None):
+        return self.dataset.rows(start, end, customer=customer)
+
+
+class ChunkedProducts:
+    """The :class:`~superstore.ranking.ProductRanking` interface over a store."""
+
+    def __init__(self, dataset, max_filters=64):
+        self.dataset = dataset
+        self.max_filters = max_filters
+        self._cache = OrderedDict()
+        self._lock = threading.Lock()
+
+    def totals(self, start=None, end=None, region=None):
+        """Sales and profit per product name for the filter, merged from per-partition partials."""
+        if start is None and end is None and region is None:
+            return self.dataset.product_totals
+        key = (start, end, region)
+        with self._lock:
+            if key in self._cache:
+                self._cache.move_to_end(key)
+                return self._cache[key]
+        totals = _Partials(_sum_by('product_name', ['sales', 'profit']))
+        for frame in self.dataset.scan(start, end, ['product_name', 'sales', 'profit'], normalized=False,
+                                       region=region):
+            totals.add(_partial_sum(frame, 'product_name', ['sales', 'profit']))
+        result = totals.result()
+        if result is None:
+            result = pd.DataFrame({'product_name': [], 'sales': [], 'profit': []})
+        with self._lock:
+            self._cache[key] = result
+            while len(self._cache) > self.max_filters:
+                self._cache.popitem(last=False)
+        return result
+
+    def rank(self, k=5, start=None, end=None, region=None, ascending=False):
+        totals = self.totals(start, end, region)
+        return rank_totals(totals['product_name'].to_numpy(), totals['sales'].to_numpy(),
+                           totals['profit'].to_numpy(), k, ascending)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('source', help="source file (.xlsx, .csv or .parquet)")
+    parser.add_argument('store', help="store directory to (re)build")
+    parser.add_argument('--append', action='store_true', help="add the source's new rows to an existing store")
+    parser.add_argument('--memory-budget', default=None,
+                        help=f"memory budget for one chunk, e.g. 512MB (default ${MEMORY_BUDGET_ENV} or 512MB)")
+    parser.add_argument('--reports', metavar='OUTPUT_DIR', help="also write every page's default reports here")
+    parser.add_argument('--top-k', type=int, default=5)
+    args = parser.parse_args(argv)
+
+    started = time.perf_counter()
+    ingest = append_store if args.append else build_store
+    dataset = ingest(args.source, args.store, budget=args.memory_budget)
+    print(f"{len(dataset)} rows in {len(dataset.manifest['partitions'])} partitions, "
+          f"{chunk_rows_for(args.memory_budget)} rows per chunk, {time.perf_counter() - started:.1f}s")
+    if args.reports:
+        from superstore import analytics
+        from superstore.batch import write_reports
+
+        write_reports(analytics.default_reports(dataset, k=args.top_k), args.reports)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
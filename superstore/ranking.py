@@ -0,0 +1,92 @@
+"""Top-k / bottom-k product rankings for Product Performance.
+
+Sales and profit per product are computed in a single pass over the filtered
+rows (a weighted ``bincount`` on the product codes) and cached per filter, so
+toggling between top and bottom products or changing ``k`` does not touch
+the rows again. The k best or worst products are picked with
+``argpartition`` rather than a full sort of every product.
+"""
+import threading
+from collections import OrderedDict
+
+import numpy as np
+import pandas as pd
+
+
+def rank_totals(names, sales, profit, k=5, ascending=False):
+    """Pick the ``k`` highest (or lowest) ``sales`` with ``argpartition``.
+
+    ``names``, ``sales`` and ``profit`` are aligned per-product arrays in
+    product-name order. The result has ``product_name``, ``sales`` and
+    ``profit`` columns in ranking order, indexed by each product's position
+    in the input.
+    """
+    k = min(k, len(sales))
+    if k <= 0:
+        picked = np.array([], dtype=np.int64)
+    else:
+        keyed = sales if ascending else -sales
+        picked = np.argpartition(keyed, k - 1)[:k] if k < len(sales) else np.arange(len(sales))
+        picked = picked[np.lexsort((picked, keyed[picked]))]
+    return pd.DataFrame({
+        'product_name': np.asarray(names)[picked],
+        'sales': sales[picked],
+        'profit': profit[picked],
+    }, index=picked)
+
+
+class ProductRanking:
+    """Cached per-filter product totals with partial-selection rankings."""
+
+    def __init__(self, frame, dates, max_filters=64):
+        self.frame = frame
+        self.dates = dates
+        self.max_filters = max_filters
+        self._codes = frame['product_name'].cat.codes.to_numpy()
+        self._categories = frame['product_name'].cat.categories
+        self._sales = frame['sales'].to_numpy()
+        self._profit = frame['profit'].to_numpy()
+        self._totals = OrderedDict()
+        self._lock = threading.Lock()
+
+    def totals(self, start=None, end=None, region=None):
+        """Sales, profit and row count per product code for one filter.
+
+        Returns a frame indexed by the codes of the products that have rows
+        in the filter, in product-name order.
+        """
+        key = (None if start is None else pd.Timestamp(start), None if end is None else pd.Timestamp(end), region)
+        with self._lock:
+            if key in self._totals:
+                self._totals.move_to_end(key)
+                return self._totals[key]
+
+        rows = self.dates.positions(start, end, region=region)
+        codes = self._codes[rows]
+        # Rows without a product name (code -1) are left out, as groupby would
+        valid = codes >= 0
+        codes = codes[valid]
+        size = len(self._categories)
+        counts = np.bincount(codes, minlength=size)
+        sales = np.bincount(codes, weights=self._sales[rows][valid], minlength=size)
+        profit = np.bincount(codes, weights=self._profit[rows][valid], minlength=size)
+        observed = np.flatnonzero(counts)
+        totals = pd.DataFrame({'sales': sales[observed], 'profit': profit[observed], 'rows': counts[observed]},
+                              index=observed)
+
+        with self._lock:
+            self._totals[key] = totals
+            while len(self._totals) > self.max_filters:
+                self._totals.popitem(last=False)
+        return totals
+
+    def rank(self, k=5, start=None, end=None, region=None, ascending=False):
+        """The ``k`` products with the highest (or, with ``ascending``, lowest) sales.
+
+        The frame has ``product_name``, ``sales`` and ``profit`` columns in
+        ranking order. Its index is each product's position among the
+        products in the filter, matching ``groupby('product_name').sum().reset_index()``.
+        """
+        totals = self.totals(start, end, region)
+        names = self._categories[totals.index.to_numpy()]
+        return rank_totals(names, totals['sales'].to_numpy(), totals['profit'].to_numpy(), k, ascending)
@@ -0,0 +1,252 @@
+"""Readers for Superstore order exports in ``.xlsx``, ``.csv`` or ``.parquet`` format.
+
+The format is taken from the file extension (or given explicitly for
+uploads, which arrive as bytes). Every reader applies :data:`SCHEMA`, so
+column types are never inferred from the data, and can project to a subset
+of columns so the rest of an export is never loaded:
+
+* CSV is parsed by pyarrow's multithreaded reader, with the columns that are
+  not wanted skipped and the text columns dictionary-encoded while parsing.
+* Parquet is read natively, reading only the wanted column chunks.
+* XLSX has no columnar reader; its rows are streamed through openpyxl's
+  read-only mode, which is much slower, and cast to the schema.
+
+:func:`read_source` returns one frame ready for
+:func:`~superstore.dataset.normalize` (it serves the default dataset and
+uploads); :func:`iter_source` streams frames of a bounded number of rows for
+the out-of-core store.
+"""
+import csv
+import io
+import os
+
+import pandas as pd
+
+FORMATS = ['xlsx', 'csv', 'parquet']
+
+# Type of every column of a Superstore export. Text columns listed as 'category' are read
+# dictionary-encoded when a whole file is loaded; columns outside the schema keep inferred types.
+SCHEMA = {
+    'order_id': 'text',
+    'order_date': 'date',
+    'ship_date': 'date',
+    'customer': 'category',
+    'manufactory': 'category',
+    'product_name': 'category',
+    'segment': 'category',
+    'category': 'category',
+    'subcategory': 'category',
+    'region': 'category',
+    'zip': 'int',
+    'city': 'category',
+    'state': 'category',
+    'country': 'category',
+    'discount': 'float',
+    'profit': 'float',
+    'quantity': 'int',
+    'sales': 'float',
+    'profit_margin': 'float',
+}
+
+# Columns the pages use; read_source() loads only these by default
+PAGE_COLUMNS = ['order_date', 'customer', 'product_name', 'category', 'subcategory', 'region', 'state',
+                'discount', 'profit', 'quantity', 'sales', 'profit_margin']
+
+# Date formats accepted in CSV files besides ISO 8601
+CSV_DATE_FORMATS = ['%m/%d/%Y', '%m/%d/%Y %H:%M:%S', '%d-%m-%Y']
+
+# Report openpyxl parse progress every this many rows
+PROGRESS_EVERY = 5000
+
+
+def source_format(source, fmt=None):
+    """Normalized format name of ``source``: ``fmt`` if given, otherwise the path's extension."""
+    if fmt is None:
+        if not isinstance(source, (str, os.PathLike)):
+            raise ValueError("the format of an in-memory source must be given")
+        fmt = os.path.splitext(os.fspath(source))[1]
+    fmt = fmt.lower().lstrip('.')
+    if fmt not in FORMATS:
+        raise ValueError(f"unsupported source format: {fmt!r}; expected one of {', '.join(FORMATS)}")
+    return fmt
+
+
+def arrow_type(column, categorical=True):
+    """pyarrow type of ``column`` under :data:`SCHEMA`, or ``None`` for columns outside it."""
+    import pyarrow as pa
+
+    kind = SCHEMA.get(column)
+    if kind is None:
+        return None
+    if kind == 'category' and categorical:
+        return pa.dictionary(pa.int32(), pa.string())
+    return {'text': pa.string(), 'category': pa.string(), 'date': pa.timestamp('us'), 'int': pa.int64(),
+            'float': pa.float64()}[kind]
+
+
+def _opened(source):
+    # pyarrow and openpyxl read bytes through a file object
+    return io.BytesIO(source) if isinstance(source, (bytes, bytearray)) else source
+
+
+def _wanted(names, columns):
+    # File columns to load, in file order
+    return list(names) if columns is None else [name for name in names if name in set(columns)]
+
+
+def _to_frame(table, categorical):
+    """Cast ``table`` to the schema and convert it to pandas, with categories sorted as normalize() sorts them."""
+    import pyarrow as pa
+
+    fields = []
+    for field in table.schema:
+        wanted = arrow_type(field.name, categorical)
+        fields.append(field if wanted is None else pa.field(field.name, wanted))
+    schema = pa.schema(fields)
+    if not table.schema.equals(schema):
+        table = table.cast(schema)
+    frame = table.to_pandas()
+    for column in frame.columns:
+        if isinstance(frame[column].dtype, pd.CategoricalDtype):
+            frame[column] = frame[column].cat.reorder_categories(sorted(frame[column].cat.categories))
+    return frame
+
+
+def _csv_header(source):
+    if isinstance(source, (bytes, bytearray)):
+        first = bytes(source[:source.find(b'\n') + 1 or len(source)]).decode('utf-8-sig')
+    else:
+        with open(source, encoding='utf-8-sig', newline='') as fh:
+            first = fh.readline()
+    return next(csv.reader([first]), [])
+
+
+def _csv_options(source, columns, categorical, block_size=None):
+    import pyarrow.csv as pacsv
+
+    names = _wanted(_csv_header(source), columns)
+    types = {name: arrow_type(name, categorical) for name in names if name in SCHEMA}
+    read_options = pacsv.ReadOptions(use_threads=True, block_size=block_size)
+    convert_options = pacsv.ConvertOptions(column_types=types, include_columns=names,
+                                           timestamp_parsers=[pacsv.ISO8601] + CSV_DATE_FORMATS)
+    return read_options, convert_options
+
+
+def iter_excel_chunks(source, chunk_rows, progress=None, columns=None):
+    """Stream the first sheet of an ``.xlsx`` file or payload as raw frames of ``chunk_rows`` rows.
+
+    ``source`` is a path or the file's bytes; only ``columns`` (default: all)
+    are kept. ``progress`` is called with a fraction between 0 and 1 as rows
+    are read (the total comes from the sheet's stored dimensions, so it is
+    only an estimate for workbooks written without them). Cells keep the
+    Python types openpyxl gives them; :func:`iter_source` casts them.
+    """
+    import openpyxl
+
+    wb = openpyxl.load_workbook(_opened(source), read_only=True, data_only=True)
+    try:
+        ws = wb.active
+        total = ws.max_row or 0
+        rows = ws.iter_rows(values_only=True)
+        header = next(rows, None)
+        if header is None:
+            return
+        names = _wanted(header, columns)
+        keep = [i for i, name in enumerate(header) if name in names]
+        records = []
+        for i, row in enumerate(rows, start=1):
+            records.append([row[j] if j < len(row) else None for j in keep])
+            if progress is not None and i % PROGRESS_EVERY == 0 and total:
+                progress(min(i / total, 1.0))
+            if len(records) == chunk_rows:
+                yield pd.DataFrame.from_records(records, columns=names)
+                records = []
+        if records:
+            yield pd.DataFrame.from_records(records, columns=names)
+    finally:
+        wb.close()
+    if progress is not None:
+        progress(1.0)
+
+
+def _excel_table(chunk):
+    import pyarrow as pa
+
+    # Cells come from openpyxl as Python objects; convert those in the schema without inference
+    fields = [pa.field(name, arrow_type(name, categorical=False)) for name in chunk.columns if name in SCHEMA]
+    typed = pa.Table.from_pandas(chunk[[field.name for field in fields]], schema=pa.schema(fields),
+                                 preserve_index=False)
+    for name in chunk.columns:
+        if name not in SCHEMA:
+            typed = typed.append_column(name, pa.array(chunk[name].infer_objects()))
+    return typed.select(list(chunk.columns))
+
+
+def iter_source(source, chunk_rows, fmt=None, columns=None, progress=None):
+    """Stream ``source`` (a path or bytes) as typed frames of at most ``chunk_rows`` rows.
+
+    Text columns stay plain strings (chunks would otherwise each carry their
+    own categories); ``columns`` defaults to every column of the file.
+    """
+    fmt = source_format(source, fmt)
+    if fmt == 'xlsx':
+        for chunk in iter_excel_chunks(source, chunk_rows, progress=progress, columns=columns):
+            yield _to_frame(_excel_table(chunk), categorical=False)
+    elif fmt == 'csv':
+        import pyarrow.csv as pacsv
+
+        # Blocks of roughly chunk_rows rows (at a few hundred bytes per row), re-sliced to exactly that
+        read_options, convert_options = _csv_options(source, columns, categorical=False,
+                                                  block_size=max(1 << 20, min(chunk_rows * 256, 1 << 30)))
+        pending = None
+        for batch in pacsv.open_csv(_opened(source), read_options=read_options, convert_options=convert_options):
+            pending = _concat(pending, batch)
+            while pending.num_rows >= chunk_rows:
+                yield _to_frame(pending.slice(0, chunk_rows), categorical=False)
+                pending = pending.slice(chunk_rows)
+        if pending is not None and pending.num_rows:
+            yield _to_frame(pending, categorical=False)
+    else:
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+
+        parquet = pq.ParquetFile(_opened(source))
+        names = _wanted(parquet.schema_arrow.names, columns)
+        for batch in parquet.iter_batches(batch_size=chunk_rows, columns=names):
+            yield _to_frame(pa.Table.from_batches([batch]), categorical=False)
+
+
+def _concat(table, batch):
+    import pyarrow as pa
+
+    batch = pa.Table.from_batches([batch])
+    return batch if table is None else pa.concat_tables([table, batch])
+
+
+def read_source(source, fmt=None, columns=PAGE_COLUMNS, progress=None):
+    """Load ``source`` (a path or bytes) into one typed frame with only ``columns`` (``None`` for all).
+
+    Text columns of the schema come back as categoricals.
+    """
+    fmt = source_format(source, fmt)
+    if fmt == 'xlsx':
+        chunks = [_excel_table(chunk) for chunk in iter_excel_chunks(source, None, progress=progress,
+                                                                         columns=columns)]
+        if not chunks:
+            return pd.DataFrame()
+        import pyarrow as pa
+
+        return _to_frame(pa.concat_tables(chunks), categorical=True)
+    if fmt == 'csv':
+        import pyarrow.csv as pacsv
+
+        read_options, convert_options = _csv_options(source, columns, categorical=True)
+        table = pacsv.read_csv(_opened(source), read_options=read_options, convert_options=convert_options)
+    else:
+        import pyarrow.parquet as pq
+
+        parquet = pq.ParquetFile(_opened(source))
+        table = parquet.read(columns=_wanted(parquet.schema_arrow.names, columns), use_threads=True)
+    if progress is not None:
+        progress(1.0)
+    return _to_frame(table, categorical=True)
@@ -0,0 +1,262 @@
+"""HyperLogLog sketches for approximate distinct counts under any filter.
+
+For each column in :data:`SKETCH_COLUMNS` a :class:`SketchStore` keeps one
+HyperLogLog sketch per day x region x category cell. Sketches merge by taking
+the register-wise maximum, so the distinct count of any date range, region
+and category is estimated from the union of the cells it covers without
+touching rows. Day cells are stored sparsely (only the registers a cell
+actually set) and are also rolled up into dense monthly sketches. A query
+merges whole months from the rollup and only the days at either end of the
+range from the sparse cells, which takes a few hundred microseconds.
+
+Error bound: with ``2 ** precision`` registers (4096 at the default
+:data:`PRECISION` of 12) the relative standard error of an estimate is
+``1.04 / sqrt(2 ** precision)``, about 1.6%. Roughly 95% of estimates are
+within twice that (3.3%) of the true count, and 99.7% within three times
+(4.9%). The bound holds at every cardinality (see :func:`estimate`), and
+counts below a few dozen are almost always exact. Pass ``exact=True`` to
+:func:`superstore.analytics.distinct_count` when an exact count is needed;
+it scans the matching rows instead.
+"""
+import numpy as np
+import pandas as pd
+
+from superstore.index import date_bounds
+
+# Columns with distinct-count sketches
+SKETCH_COLUMNS = ['customer', 'product_name']
+
+# log2 of the number of registers per sketch
+PRECISION = 12
+
+
+def relative_error(precision=PRECISION):
+    """Relative standard error of a HyperLogLog estimate with ``2 ** precision`` registers."""
+    return 1.04 / np.sqrt(2 ** precision)
+
+
+def hash_values(values):
+    """Stable 64-bit hashes of ``values`` (each distinct value hashed once) and the mask of non-missing values."""
+    codes, uniques = pd.factorize(values)
+    hashes = pd.util.hash_array(np.asarray(uniques, dtype=object))
+    present = codes >= 0
+    return hashes[codes[present]], present
+
+
+def registers_and_ranks(hashes, precision=PRECISION):
+    """HyperLogLog register index (the top ``precision`` bits) and rank of each hash.
+
+    The rank is the position of the first set bit in the remaining bits,
+    counted from 1.
+    """
+    if not 11 <= precision <= 16:
+        raise ValueError("precision must be between 11 and 16")
+    width = 64 - precision
+    registers = (hashes >> np.uint64(width)).astype(np.uint16)
+    # The remaining bits fit in a float64 mantissa (width <= 53), so frexp gives their exact bit length
+    rest = (hashes & np.uint64((1 << width) - 1)).astype(np.float64)
+    bit_length = np.where(rest > 0, np.frexp(rest)[1], 0)
+    return registers, (width - bit_length + 1).astype(np.uint8)
+
+
+def _sigma(x):
+    if x == 1:
+        return np.inf
+    y, z = 1.0, x
+    while True:
+        x *= x
+        previous, z = z, z + x * y
+        y += y
+        if z == previous:
+            return z
+
+
+def _tau(x):
+    if x == 0 or x == 1:
+        return 0.0
+    y, z = 1.0, 1 - x
+    while True:
+        x = np.sqrt(x)
+        y *= 0.5
+        previous, z = z, z - (1 - x) ** 2 * y
+        if z == previous:
+            return z / 3
+
+
+def estimate(registers, precision=PRECISION):
+    """Distinct-count estimate from one sketch's registers.
+
+    Uses Ertl's improved estimator over the histogram of register values
+    ("New cardinality estimation algorithms for HyperLogLog sketches",
+    2017), which needs no bias correction and stays unbiased from zero to
+    billions of values.
+    """
+    m = len(registers)
+    width = 64 - precision
+    histogram = np.bincount(registers, minlength=width + 2)
+    z = m * _tau(1 - histogram[width + 1] / m)
+    for k in range(width, 0, -1):
+        z = 0.5 * (z + histogram[k])
+    z += m * _sigma(histogram[0] / m)
+    return m * m / (2 * np.log(2) * z)
+
+
+def _max_per_key(keys, ranks):
+    # Keep the highest rank of every key; keys come back sorted
+    order = np.lexsort((ranks, keys))
+    keys, ranks = keys[order], ranks[order]
+    last = np.r_[keys[1:] != keys[:-1], True] if len(keys) else np.array([], dtype=bool)
+    return keys[last], ranks[last]
+
+
+class SketchStore:
+    """Sparse day x region x category sketches of one column, plus dense monthly rollups."""
+
+    def __init__(self, days, regions, categories, keys, ranks, precision=PRECISION):
+        self.days = pd.DatetimeIndex(days)
+        self.regions = list(regions)
+        self.categories = list(categories)
+        self.precision = precision
+        m = 2 ** precision
+        # Sorted keys are cell * m + register, with cell = (day * regions + region) * categories + category
+        self._keys = keys
+        self._ranks = ranks
+        self._day_numbers = self.days.to_numpy()
+        cells = len(self.regions) * len(self.categories)
+        self._cell_starts = np.searchsorted(keys, np.arange(len(self.days) + 1, dtype=np.int64) * cells * m)
+
+        months = self.days.to_period('M')
+        self._month_starts = np.r_[np.flatnonzero(np.r_[True, months[1:] != months[:-1]]) if len(months) else [],
+                                   len(self.days)].astype(np.int64)
+        self._month_of_day = np.repeat(np.arange(len(self._month_starts) - 1), np.diff(self._month_starts))
+        self.monthly = np.zeros((len(self._month_starts) - 1, len(self.regions), len(self.categories), m), np.uint8)
+        cell, register = np.divmod(keys, m)
+        day, rest = np.divmod(cell, cells)
+        region, category = np.divmod(rest, len(self.categories))
+        np.maximum.at(self.monthly, (self._month_of_day[day], region, category, register), ranks)
+
+    @classmethod
+    def from_cells(cls, cells, days, regions, categories, precision=PRECISION):
+        """Lay out :func:`cell_ranks` output on the calendar ``days`` and the listed regions and categories."""
+        regions, categories = list(regions), list(categories)
+        first = pd.Timestamp(days[0]).to_datetime64().astype('datetime64[D]') if len(days) else None
+        if first is None or len(cells) == 0:
+            return cls(days, regions, categories, np.array([], dtype=np.int64), np.array([], dtype=np.uint8),
+                       precision)
+        day = (cells['order_date'].to_numpy().astype('datetime64[D]') - first).astype(np.int64)
+        region = pd.Categorical(cells['region'], categories=regions).codes.astype(np.int64)
+        category = pd.Categorical(cells['category'], categories=categories).codes.astype(np.int64)
+        valid = (region >= 0) & (category >= 0) & (day >= 0) & (day < len(days))
+        cell = (day * len(regions) + region) * len(categories) + category
+        keys = cell * 2 ** precision + cells['register'].to_numpy().astype(np.int64)
+        keys, ranks = _max_per_key(keys[valid], cells['rank'].to_numpy()[valid])
+        return cls(days, regions, categories, keys, ranks, precision)
+
+    def __len__(self):
+        return len(self._keys)
+
+    @property
+    def nbytes(self):
+        return self._keys.nbytes + self._ranks.nbytes + self.monthly.nbytes
+
+    def _merge_days(self, registers, lo, hi, region, category):
+        # Fold the sparse cells of days [lo, hi) into ``registers``
+        keys = self._keys[self._cell_starts[lo]:self._cell_starts[hi]]
+        ranks = self._ranks[self._cell_starts[lo]:self._cell_starts[hi]]
+        m = len(registers)
+        cell = keys // m
+        keep = np.ones(len(keys), dtype=bool)
+        if region is not None:
+            keep &= (cell // len(self.categories)) % len(self.regions) == region
+        if category is not None:
+            keep &= cell % len(self.categories) == category
+        np.maximum.at(registers, keys[keep] % m, ranks[keep])
+
+    def registers(self, start=None, end=None, region=None, category=None):
+        """Registers of the union of the cells matching the filters (all zeros when nothing matches)."""
+        registers = np.zeros(2 ** self.precision, dtype=np.uint8)
+        if (region is not None and region not in self.regions) or (
+                category is not None and category not in self.categories):
+            return registers
+        region = None if region is None else self.regions.index(region)
+        category = None if category is None else self.categories.index(category)
+        lo, hi = date_bounds(self._day_numbers, start, end)
+        if hi == lo:
+            return registers
+        # Months entirely inside the range come from the dense rollup, the days at either end from the cells
+        first = self._month_of_day[lo] + (self._month_starts[self._month_of_day[lo]] != lo)
+        last = self._month_of_day[hi - 1] + (self._month_starts[self._month_of_day[hi - 1] + 1] == hi)
+        if first >= last:
+            self._merge_days(registers, lo, hi, region, category)
+            return registers
+        months = self.monthly[first:last]
+        months = months if region is None else months[:, [region]]
+        months = months if category is None else months[:, :, [category]]
+        np.maximum(registers, months.max(axis=(0, 1, 2)), out=registers)
+        self._merge_days(registers, lo, self._month_starts[first], region, category)
+        self._merge_days(registers, self._month_starts[last], hi, region, category)
+        return registers
+
+    def count(self, start=None, end=None, region=None, category=None):
+        """Estimated number of distinct values in the matching rows."""
+        return int(round(estimate(self.registers(start, end, region, category), self.precision)))
+
+
+def _cell_frame(days, regions, categories, registers, ranks, precision=PRECISION):
+    # Highest rank per (day, region, category, register), keyed by plain values so partials of any chunks merge
+    m = 2 ** precision
+    region_codes, region_values = pd.factorize(regions)
+    category_codes, category_values = pd.factorize(categories)
+    valid = (region_codes >= 0) & (category_codes >= 0)
+    if not valid.any():
+        return pd.DataFrame({'order_date': np.array([], dtype='datetime64[ns]'), 'region': [], 'category': [],
+                             'register': np.array([], dtype=np.uint16), 'rank': np.array([], dtype=np.uint8)})
+    day = np.asarray(days).astype('datetime64[D]').astype(np.int64)
+    first = day[valid].min()
+    n_regions, n_categories = len(region_values), len(category_values)
+    cell = ((day - first) * n_regions + region_codes) * n_categories + category_codes
+    keys, ranks = _max_per_key((cell * m + registers)[valid], np.asarray(ranks)[valid])
+    cell, register = np.divmod(keys, m)
+    rest, category = np.divmod(cell, n_categories)
+    day, region = np.divmod(rest, n_regions)
+    return pd.DataFrame({
+        'order_date': (day + first).astype('datetime64[D]').astype('datetime64[ns]'),
+        'region': pd.Categorical.from_codes(region, categories=pd.Index(np.asarray(region_values))),
+        'category': pd.Categorical.from_codes(category, categories=pd.Index(np.asarray(category_values))),
+        'register': register.astype(np.uint16),
+        'rank': ranks.astype(np.uint8),
+    })
+
+
+def cell_ranks(frame, column, precision=PRECISION):
+    """Sparse sketch cells of ``column`` over a frame of rows: the highest rank per day, region, category and register.
+
+    The result is keyed by values rather than positions, so the cells of
+    separate chunks (or of a stored aggregate and a new file) combine with
+    :func:`merge_cell_ranks`.
+    """
+    hashes, present = hash_values(frame[column])
+    registers, ranks = registers_and_ranks(hashes, precision)
+    return _cell_frame(frame['order_date'].to_numpy()[present], frame['region'].array[present],
+                       frame['category'].array[present], registers, ranks, precision)
+
+
+def merge_cell_ranks(frames, precision=PRECISION):
+    """Cells of the union of the rows behind each frame of :func:`cell_ranks` output."""
+    cells = pd.concat(frames, ignore_index=True)
+    return _cell_frame(cells['order_date'].to_numpy(), cells['region'].to_numpy(), cells['category'].to_numpy(),
+                       cells['register'].to_numpy(), cells['rank'].to_numpy(), precision)
+
+
+def build_sketches(frames, days, regions, categories, columns=SKETCH_COLUMNS, precision=PRECISION):
+    """One :class:`SketchStore` per column from ``frames`` of rows, folded in one at a time.
+
+    ``days`` is the continuous calendar the rows fall in; rows of other
+    regions or categories than those listed are ignored.
+    """
+    stores = {}
+    for column in columns:
+        parts = [cell_ranks(frame, column, precision) for frame in frames]
+        cells = parts[0] if len(parts) == 1 else merge_cell_ranks(parts, precision)
+        stores[column] = SketchStore.from_cells(cells, days, regions, categories, precision)
+    return stores
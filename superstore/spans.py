@@ -0,0 +1,259 @@
+"""Span instrumentation for the app's hot paths.
+
+A :class:`Trace` collects the spans of one rerun: the workbook parse, the
+``to_datetime`` pass, each page aggregation (``groupby``), figure
+construction and ``st.plotly_chart``. Every span records its wall time, the
+rows going in and out and, when memory tracing is on, the peak memory
+allocated while it ran (via :mod:`tracemalloc`, which slows Python down
+noticeably, so it is only enabled on request).
+
+tracemalloc is process-wide. It runs while at least one trace that asked for
+it is open and is stopped when the last one is released. A rerun cut short
+(``st.stop()``, a widget-triggered rerun) never reaches :meth:`Trace.finish`,
+so callers should :meth:`~Trace.release` such a trace once they know it is
+over; :func:`start` also releases any memory trace left open for longer than
+:data:`ORPHAN_SECONDS`. Peaks are process-wide too: memory allocated by
+other sessions or by the warm-up threads while a span runs is counted in its
+``peak_bytes``, and another trace resetting the peak can lower it. Read the
+peaks as indicative, and exact only when nothing else is running.
+
+Library code calls :func:`span` or decorates functions with :func:`traced`;
+both are no-ops costing a context-variable lookup when no trace is active.
+Finished traces can be appended to a JSON-lines log (``$SUPERSTORE_SPAN_LOG``),
+one record per span, and summarized into p50/p95 timings with::
+
+    python -m superstore.spans spans.jsonl [--by page span filters]
+"""
+import argparse
+import contextvars
+import json
+import os
+import sys
+import threading
+import time
+import tracemalloc
+import uuid
+from contextlib import contextmanager
+from functools import wraps
+
+LOG_ENV = 'SUPERSTORE_SPAN_LOG'
+
+# A memory trace still open after this long belongs to a rerun that ended early
+ORPHAN_SECONDS = 600
+
+_current = contextvars.ContextVar('superstore_trace', default=None)
+_log_lock = threading.Lock()
+
+# Open traces that asked for memory tracing, and whether this module started tracemalloc
+_memory_lock = threading.Lock()
+_memory_traces = set()
+_started_tracemalloc = False
+
+
+def _acquire_memory(trace):
+    global _started_tracemalloc
+    with _memory_lock:
+        _memory_traces.add(trace)
+        if not tracemalloc.is_tracing():
+            tracemalloc.start()
+            _started_tracemalloc = True
+
+
+def _release_memory(trace):
+    global _started_tracemalloc
+    with _memory_lock:
+        _memory_traces.discard(trace)
+        # Only stop tracemalloc if this module started it (not, say, python -X tracemalloc)
+        if not _memory_traces and _started_tracemalloc:
+            tracemalloc.stop()
+            _started_tracemalloc = False
+
+
+def _release_orphans(now):
+    with _memory_lock:
+        orphans = [trace for trace in _memory_traces if now - trace._started > ORPHAN_SECONDS]
+    for trace in orphans:
+        trace.release()
+
+
+class Span:
+    """One timed stage. ``rows_out`` may be set by the code inside the span."""
+
+    __slots__ = ('name', 'detail', 'filters', 'depth', 'rows_in', 'rows_out', 'seconds', 'peak_bytes',
+                 '_child_peak')
+
+    def __init__(self, name, detail=None, filters=None, depth=0, rows_in=None):
+        self.name = name
+        self.detail = detail
+        self.filters = filters
+        self.depth = depth
+        self.rows_in = rows_in
+        self.rows_out = None
+        self.seconds = None
+        self.peak_bytes = None
+        self._child_peak = 0
+
+
+class Trace:
+    """The spans of one rerun (or one batch job)."""
+
+    def __init__(self, page=None, memory=False, log_path=None):
+        self.run = uuid.uuid4().hex[:12]
+        self.page = page
+        self.spans = []
+        self.log_path = os.environ.get(LOG_ENV) if log_path is None else log_path
+        self._stack = []
+        self._started = time.perf_counter()
+        self.seconds = None
+        self.memory = memory
+        if memory:
+            _acquire_memory(self)
+
+    @contextmanager
+    def span(self, name, rows_in=None, detail=None, filters=None):
+        record = Span(name, detail, filters, len(self._stack), rows_in)
+        self.spans.append(record)
+        # Traces that did not ask for memory tracing leave the shared peak alone
+        tracing = self.memory and tracemalloc.is_tracing()
+        if tracing:
+            # The peak is process-wide, so save the parent's peak so far before resetting it
+            current, peak = tracemalloc.get_traced_memory()
+            if self._stack:
+                self._stack[-1]._child_peak = max(self._stack[-1]._child_peak, peak)
+            tracemalloc.reset_peak()
+        self._stack.append(record)
+        started = time.perf_counter()
+        try:
+            yield record
+        finally:
+            record.seconds = time.perf_counter() - started
+            self._stack.pop()
+            if tracing and tracemalloc.is_tracing():
+                peak = max(tracemalloc.get_traced_memory()[1], record._child_peak)
+                record.peak_bytes = max(0, peak - current)
+                if self._stack:
+                    self._stack[-1]._child_peak = max(self._stack[-1]._child_peak, peak)
+
+    def records(self):
+        """The spans as JSON-serializable dicts, plus a ``rerun`` record for the whole trace."""
+        common = {'run': self.run, 'page': self.page}
+        records = [dict(common, span=s.name, detail=s.detail, filters=s.filters, depth=s.depth,
+                        seconds=s.seconds, rows_in=s.rows_in, rows_out=s.rows_out, peak_bytes=s.peak_bytes)
+                   for s in self.spans]
+        if self.seconds is not None:
+            records.append(dict(common, span='rerun', detail=None, filters=None, depth=0, seconds=self.seconds,
+                                rows_in=None, rows_out=None, peak_bytes=None))
+        return records
+
+    def release(self):
+        """Stop asking for memory tracing and deactivate the trace, without logging it.
+
+        Safe to call more than once, and after :meth:`finish`.
+        """
+        if _current.get() is self:
+            _current.set(None)
+        if self.memory:
+            self.memory = False
+            _release_memory(self)
+
+    def finish(self):
+        """Close the trace, append it to the log if one is configured, and return its records."""
+        self.seconds = time.perf_counter() - self._started
+        self.release()
+        records = self.records()
+        if self.log_path:
+            now = time.time()
+            lines = ''.join(json.dumps(dict(record, ts=now), default=str) + '\n' for record in records)
+            with _log_lock, open(self.log_path, 'a') as fh:
+                fh.write(lines)
+        return records
+
+
+def start(page=None, memory=False, log_path=None):
+    """Start a :class:`Trace` and make it the active one for this thread.
+
+    Memory traces left open for longer than :data:`ORPHAN_SECONDS` are
+    released first.
+    """
+    _release_orphans(time.perf_counter())
+    trace = Trace(page, memory, log_path)
+    _current.set(trace)
+    return trace
+
+
+def current():
+    """The active :class:`Trace`, or ``None``."""
+    return _current.get()
+
+
+@contextmanager
+def span(name, rows_in=None, detail=None, filters=None):
+    """Time a stage in the active trace; yields a :class:`Span` (discarded when nothing is tracing)."""
+    trace = _current.get()
+    if trace is None:
+        yield Span(name, detail, filters, rows_in=rows_in)
+        return
+    with trace.span(name, rows_in, detail, filters) as record:
+        yield record
+
+
+def _rows(value):
+    try:
+        return len(value)
+    except TypeError:
+        return None
+
+
+def traced(name):
+    """Decorator recording each call as a ``name`` span.
+
+    The first argument's length is the rows in, the result's length the
+    rows out, and the remaining arguments describe the filter combination.
+    """
+    def decorate(func):
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            if _current.get() is None:
+                return func(*args, **kwargs)
+            filters = repr(args[1:] + tuple(sorted(kwargs.items()))) if len(args) > 1 or kwargs else None
+            with span(name, rows_in=_rows(args[0]) if args else None, detail=func.__name__,
+                      filters=filters) as record:
+                result = func(*args, **kwargs)
+                record.rows_out = _rows(result)
+            return result
+        return wrapper
+    return decorate
+
+
+def read_log(path):
+    """Records of a JSON-lines span log as a frame."""
+    import pandas as pd
+
+    with open(path) as fh:
+        return pd.DataFrame([json.loads(line) for line in fh if line.strip()])
+
+
+def summarize(records, by=('page', 'span')):
+    """Count, p50, p95 and max of the span durations (in ms) grouped by ``by``."""
+    frame = records.assign(ms=records['seconds'] * 1000)
+    grouped = frame.groupby(list(by), dropna=False)['ms']
+    summary = grouped.agg(count='size', p50=lambda ms: ms.quantile(0.5), p95=lambda ms: ms.quantile(0.95),
+                          max='max')
+    return summary.reset_index().sort_values('p95', ascending=False, ignore_index=True)
+
+
+def main(argv=None):
+    import pandas as pd
+
+    parser = argparse.ArgumentParser(description="Summarize a span log into p50/p95 timings.")
+    parser.add_argument('log', help=f"JSON-lines span log (as written to ${LOG_ENV})")
+    parser.add_argument('--by', nargs='+', default=['page', 'span'],
+                        help="columns to group by, e.g. page span detail filters (default: page span)")
+    args = parser.parse_args(argv)
+    with pd.option_context('display.max_rows', None, 'display.width', 200, 'display.max_colwidth', 60):
+        print(summarize(read_log(args.log), args.by).to_string(index=False, float_format='%.1f'))
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
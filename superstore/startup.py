@@ -0,0 +1,166 @@
+"""Startup-time report for app.py.
+
+Measures, each in a fresh interpreter, the import time of every module that
+app.py imports at the top level and the time until the first page of the
+app has rendered. It also checks that libraries meant to load lazily
+(seaborn, matplotlib, openpyxl) were not imported during that first render.
+
+A freshly started worker usually finds the sidecar cache cold and has to
+parse the source once (which is when openpyxl is loaded, on purpose). So the
+app is rendered twice: the first render primes the cache and its time, and
+that of the parse it triggered, is reported on its own. The budgets and the
+lazy-import check apply to the second render. Exits non-zero when a budget is
+exceeded, so it can gate a deploy::
+
+    python -m superstore.startup --render-budget-ms 3000 --import-budget-ms 1500
+
+Budgets can also be set with the ``SUPERSTORE_IMPORT_BUDGET_MS`` and
+``SUPERSTORE_RENDER_BUDGET_MS`` environment variables.
+"""
+import argparse
+import ast
+import json
+import os
+import subprocess
+import sys
+import tempfile
+
+APP_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'app.py')
+
+# Libraries that must only be imported on the code paths that use them
+LAZY_MODULES = ['seaborn', 'matplotlib', 'openpyxl']
+
+DEFAULT_IMPORT_BUDGET_MS = 2000
+DEFAULT_RENDER_BUDGET_MS = 5000
+
+# Runs in a child interpreter: render the default page once and report
+_RENDER_SCRIPT = """
+import json, sys, time
+start = time.perf_counter()
+from streamlit.testing.v1 import AppTest
+imported = time.perf_counter()
+at = AppTest.from_file(sys.argv[1], default_timeout=float(sys.argv[2]))
+at.run()
+done = time.perf_counter()
+print(json.dumps({
+    'streamlit_import_ms': (imported - start) * 1000,
+    'first_render_ms': (done - imported) * 1000,
+    'total_ms': (done - start) * 1000,
+    'exceptions': [str(e.value) for e in at.exception],
+    'lazy_loaded': [m for m in sys.argv[3].split(',') if m in sys.modules],
+}))
+"""
+
+
+def top_level_imports(path=APP_PATH):
+    """Modules imported at the top level of ``path``, in source order."""
+    with open(path) as fh:
+        tree = ast.parse(fh.read(), filename=path)
+    modules = []
+    for node in tree.body:
+        if isinstance(node, ast.Import):
+            modules += [alias.name for alias in node.names]
+        elif isinstance(node, ast.ImportFrom) and node.module and not node.level:
+            modules.append(node.module)
+    return list(dict.fromkeys(modules))
+
+
+def import_times(modules, cwd=None):
+    """Cumulative import time in ms of each module, imported in order in a fresh interpreter.
+
+    Uses ``python -X importtime``, so a module's time excludes dependencies
+    already loaded by the modules before it.
+    """
+    code = '\n'.join(f'import {module}' for module in modules)
+    result = subprocess.run([sys.executable, '-X', 'importtime', '-c', code], cwd=cwd,
+                            capture_output=True, text=True)
+    if result.returncode:
+        raise RuntimeError(result.stderr.strip().splitlines()[-1])
+    times = {}
+    for line in result.stderr.splitlines():
+        if not line.startswith('import time:') or 'cumulative' in line:
+            continue
+        _, cumulative, name = (part.strip() for part in line[len('import time:'):].split('|'))
+        if name in modules:
+            times[name] = int(cumulative) / 1000
+    return {module: times.get(module, 0.0) for module in modules}
+
+
+def first_render(app_path=APP_PATH, timeout=120):
+    """Time to the first completed run of the app's default page, in a fresh interpreter.
+
+    ``parse_ms`` is the time spent parsing the source (0 when the sidecar
+    cache was warm), taken from the span log of the run.
+    """
+    from superstore.spans import LOG_ENV
+
+    fd, log_path = tempfile.mkstemp(suffix='.jsonl')
+    os.close(fd)
+    try:
+        result = subprocess.run([sys.executable, '-c', _RENDER_SCRIPT, app_path, str(timeout),
+                                 ','.join(LAZY_MODULES)], cwd=os.path.dirname(app_path), capture_output=True,
+                                text=True, env=dict(os.environ, **{LOG_ENV: log_path}))
+        if result.returncode:
+            raise RuntimeError(result.stderr.strip().splitlines()[-1])
+        with open(log_path) as fh:
+            records = [json.loads(line) for line in fh if line.strip()]
+    finally:
+        os.remove(log_path)
+    render = json.loads(result.stdout.strip().splitlines()[-1])
+    render['parse_ms'] = sum(record['seconds'] for record in records if record['span'] == 'parse') * 1000
+    return render
+
+
+def report(import_budget_ms, render_budget_ms, app_path=APP_PATH):
+    """Collect the timings and the list of failed checks."""
+    imports = import_times(top_level_imports(app_path), cwd=os.path.dirname(app_path))
+    # Prime the sidecar cache, as the first session on a new worker does
+    cold = first_render(app_path)
+    render = first_render(app_path)
+    failures = []
+    total_import_ms = sum(imports.values())
+    if total_import_ms > import_budget_ms:
+        failures.append(f"imports took {total_import_ms:.0f} ms (budget {import_budget_ms} ms)")
+    if render['first_render_ms'] > render_budget_ms:
+        failures.append(f"first render took {render['first_render_ms']:.0f} ms (budget {render_budget_ms} ms)")
+    if render['lazy_loaded']:
+        failures.append(f"imported during first render: {', '.join(render['lazy_loaded'])}")
+    if render['exceptions']:
+        failures.append(f"first render raised: {render['exceptions'][0]}")
+    return {'imports_ms': imports, 'total_import_ms': total_import_ms, 'cold_render': cold, 'render': render,
+            'failures': failures}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--app', default=APP_PATH, help="path to the Streamlit script")
+    parser.add_argument('--import-budget-ms', type=float,
+                        default=float(os.environ.get('SUPERSTORE_IMPORT_BUDGET_MS', DEFAULT_IMPORT_BUDGET_MS)))
+    parser.add_argument('--render-budget-ms', type=float,
+                        default=float(os.environ.get('SUPERSTORE_RENDER_BUDGET_MS', DEFAULT_RENDER_BUDGET_MS)))
+    parser.add_argument('--json', action='store_true', help="print the report as JSON")
+    args = parser.parse_args(argv)
+
+    result = report(args.import_budget_ms, args.render_budget_ms, os.path.abspath(args.app))
+    if args.json:
+        print(json.dumps(result, indent=2))
+    else:
+        print("Import time per module:")
+        for module, ms in sorted(result['imports_ms'].items(), key=lambda item: -item[1]):
+            print(f"  {module:<30} {ms:8.1f} ms")
+        print(f"  {'total':<30} {result['total_import_ms']:8.1f} ms")
+        cold = result['cold_render']
+        if cold['parse_ms']:
+            print(f"First render with a cold cache: {cold['first_render_ms']:.1f} ms "
+                  f"(of which {cold['parse_ms']:.1f} ms parsing the source)")
+        print(f"Time to first render: {result['render']['first_render_ms']:.1f} ms "
+              f"({result['render']['total_ms']:.1f} ms including the Streamlit test harness import)")
+        for failure in result['failures']:
+            print(f"FAIL: {failure}")
+        if not result['failures']:
+            print("OK: within budget")
+    return 1 if result['failures'] else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
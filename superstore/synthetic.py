@@ -0,0 +1,250 @@
+"""Synthetic Superstore-schema data for scaling tests and benchmarks.
+
+Generates orders with the same columns as ``superstore.xlsx`` and
+distributions modelled on it: the real category/subcategory and
+region/state hierarchies, skewed customer and product popularity,
+seasonal order volume with growth over the years, and discounts that eat
+into margins. Cardinalities of customers and products grow with the row
+count. Large datasets are produced in chunks so 50M rows never have to be
+held in memory at once::
+
+    python -m superstore.synthetic 10M orders_10m.parquet
+"""
+import argparse
+import sys
+
+import numpy as np
+import pandas as pd
+
+SIZES = {'10k': 10_000, '1m': 1_000_000, '10m': 10_000_000, '50m': 50_000_000}
+
+SUBCATEGORIES = {
+    'Furniture': {'Bookcases': 228, 'Chairs': 617, 'Furnishings': 957, 'Tables': 319},
+    'Office Supplies': {'Appliances': 466, 'Art': 796, 'Binders': 1523, 'Envelopes': 254, 'Fasteners': 217,
+                        'Labels': 364, 'Paper': 1370, 'Storage': 846, 'Supplies': 190},
+    'Technology': {'Accessories': 775, 'Copiers': 68, 'Machines': 115, 'Phones': 889},
+}
+
+# Median line value per subcategory in the bundled dataset
+MEDIAN_SALES = {'Accessories': 100.0, 'Appliances': 82.7, 'Art': 15.5, 'Binders': 18.6, 'Bookcases': 306.8,
+                'Chairs': 362.1, 'Copiers': 1100.0, 'Envelopes': 29.0, 'Fasteners': 10.6, 'Furnishings': 42.0,
+                'Labels': 14.9, 'Machines': 600.0, 'Paper': 26.7, 'Phones': 210.0, 'Storage': 113.9,
+                'Supplies': 27.9, 'Tables': 447.8}
+
+# Typical margin before discounts
+BASE_MARGIN = {'Accessories': 0.25, 'Appliances': 0.3, 'Art': 0.25, 'Binders': 0.35, 'Bookcases': 0.1,
+               'Chairs': 0.1, 'Copiers': 0.4, 'Envelopes': 0.42, 'Fasteners': 0.3, 'Furnishings': 0.2,
+               'Labels': 0.44, 'Machines': 0.15, 'Paper': 0.43, 'Phones': 0.2, 'Storage': 0.15,
+               'Supplies': 0.15, 'Tables': 0.05}
+
+REGIONS = {
+    'Central': (0.23, ['Texas', 'Illinois', 'Michigan', 'Indiana', 'South Dakota', 'Wisconsin', 'Missouri',
+                       'Minnesota', 'Iowa', 'Oklahoma', 'Nebraska', 'Kansas', 'North Dakota']),
+    'East': (0.29, ['Pennsylvania', 'Delaware', 'Ohio', 'New York', 'New Jersey', 'Massachusetts', 'Maryland',
+                    'Connecticut', 'New Hampshire', 'Maine', 'Rhode Island', 'District of Columbia', 'Vermont',
+                    'West Virginia']),
+    'South': (0.16, ['Georgia', 'Kentucky', 'Virginia', 'South Carolina', 'Louisiana', 'Arkansas', 'Tennessee',
+                     'Florida', 'North Carolina', 'Mississippi', 'Alabama']),
+    'West': (0.32, ['California', 'Oregon', 'Arizona', 'Nevada', 'Washington', 'Colorado', 'Utah', 'New Mexico',
+                    'Montana', 'Idaho', 'Wyoming']),
+}
+
+SEGMENTS = (['Consumer', 'Corporate', 'Home Office'], [0.52, 0.30, 0.18])
+DISCOUNTS = ([0.0, 0.1, 0.15, 0.2, 0.3, 0.32, 0.4, 0.45, 0.5, 0.6, 0.7, 0.8],
+             [0.48, 0.0094, 0.0052, 0.3659, 0.0227, 0.0027, 0.0206, 0.0011, 0.0066, 0.0138, 0.0418, 0.0302])
+QUANTITIES = (np.arange(1, 15), [0.09, 0.24, 0.241, 0.119, 0.123, 0.057, 0.061, 0.026, 0.026, 0.006, 0.003,
+                                 0.002, 0.003, 0.003])
+
+FIRST_NAMES = ['Aaron', 'Alan', 'Alice', 'Amy', 'Andrew', 'Anna', 'Brian', 'Carl', 'Carol', 'Chris', 'Claire',
+               'Dan', 'Darren', 'David', 'Diana', 'Edward', 'Emily', 'Eric', 'Frank', 'Grace', 'Greg', 'Helen',
+               'Irene', 'Jack', 'Jane', 'Jason', 'Julia', 'Karen', 'Kevin', 'Laura', 'Linda', 'Mark', 'Mary',
+               'Nancy', 'Nick', 'Olivia', 'Paul', 'Peter', 'Rachel', 'Robert', 'Ruth', 'Sam', 'Sarah', 'Sean',
+               'Steve', 'Susan', 'Tom', 'Tracy', 'Victor', 'Zoe']
+LAST_NAMES = ['Adams', 'Allen', 'Baker', 'Bell', 'Brooks', 'Brown', 'Campbell', 'Carter', 'Clark', 'Collins',
+              'Cook', 'Davis', 'Edwards', 'Evans', 'Fisher', 'Garcia', 'Gray', 'Green', 'Hall', 'Harris', 'Hill',
+              'Hughes', 'Jackson', 'James', 'Johnson', 'Jones', 'Kelly', 'King', 'Lee', 'Lewis', 'Martin',
+              'Miller', 'Mitchell', 'Moore', 'Morgan', 'Murphy', 'Nelson', 'Parker', 'Perez', 'Phillips',
+              'Powers', 'Reed', 'Roberts', 'Scott', 'Smith', 'Stewart', 'Taylor', 'Turner', 'Walker', 'Wilson']
+MANUFACTURERS = ['Acme', 'Avery', 'Bretford', 'Canon', 'Cisco', 'Eldon', 'Fellowes', 'GBC', 'Global', 'HON',
+                 'Hewlett-Packard', 'Hon', 'Logitech', 'Newell', 'Office Star', 'Samsung', 'Staples', 'Tenex',
+                 'Wilson Jones', 'Xerox']
+
+
+def parse_size(text):
+    """Row count for ``'10k'``, ``'1M'``, ``'2500000'`` etc."""
+    text = str(text).strip().lower().replace('_', '')
+    if text in SIZES:
+        return SIZES[text]
+    for suffix, factor in (('k', 1_000), ('m', 1_000_000)):
+        if text.endswith(suffix):
+            return int(float(text[:-len(suffix)]) * factor)
+    return int(text)
+
+
+def _zipf_weights(n, exponent):
+    weights = 1.0 / np.arange(10, n + 10) ** exponent
+    return weights / weights.sum()
+
+
+class _Vocabulary:
+    """Customers, products and geography shared by every chunk of one dataset."""
+
+    def __init__(self, n_rows, rng):
+        n_customers = int(np.clip(n_rows / 12.6, 800, 1_000_000))
+        n_products = int(np.clip(n_rows / 5.4, 1_850, 200_000))
+
+        names = np.array([f"{first} {last}" for first in FIRST_NAMES for last in LAST_NAMES], dtype=object)
+        picks = rng.permutation(np.arange(n_customers)) % len(names)
+        repeat = np.arange(n_customers) // len(names)
+        self.customers = np.array([name if r == 0 else f"{name} {r + 1}" for name, r in zip(names[picks], repeat)],
+                                  dtype=object)
+        self.customer_segment = rng.choice(len(SEGMENTS[0]), size=n_customers, p=SEGMENTS[1])
+        self.customer_weights = _zipf_weights(n_customers, 0.6)
+
+        pairs = [(category, sub, count) for category, subs in SUBCATEGORIES.items() for sub, count in subs.items()]
+        self.categories = np.array([c for c, _, _ in pairs], dtype=object)
+        self.subcategories = np.array([s for _, s, _ in pairs], dtype=object)
+        sub_weights = np.array([count for _, _, count in pairs], dtype=float)
+        self.product_sub = rng.choice(len(pairs), size=n_products, p=sub_weights / sub_weights.sum())
+        self.product_maker = rng.integers(len(MANUFACTURERS), size=n_products)
+        self.products = np.array([f"{MANUFACTURERS[m]} {self.subcategories[s]} {i:06d}"
+                                  for i, (s, m) in enumerate(zip(self.product_sub, self.product_maker))], dtype=object)
+        medians = np.array([MEDIAN_SALES[s] for s in self.subcategories])
+        # Unit price so that a median line (about 3 units) matches the real median line value
+        self.product_price = medians[self.product_sub] / 3 * rng.lognormal(0.0, 0.5, size=n_products)
+        self.product_weights = _zipf_weights(n_products, 0.5)[rng.permutation(n_products)]
+        self.base_margin = np.array([BASE_MARGIN[s] for s in self.subcategories])
+
+        self.regions = np.array(list(REGIONS), dtype=object)
+        self.region_weights = np.array([share for share, _ in REGIONS.values()])
+        self.states = [np.array(states, dtype=object) for _, states in REGIONS.values()]
+        self.state_weights = [_zipf_weights(len(states), 1.2) for states in self.states]
+        self.cities = {state: np.array([f"{state} City {j}" for j in range(1, 13)], dtype=object)
+                       for states in self.states for state in states}
+        self.zips = {state: rng.integers(10_000, 99_999, size=12) for states in self.states for state in states}
+
+
+def _day_cdf(start, years):
+    # Order volume grows ~15% a year and peaks in Nov/Dec, with quieter weekends
+    days = pd.date_range(start, periods=int(round(365.25 * years)), freq='D')
+    t = np.arange(len(days)) / 365.25
+    weights = (1.15 ** t) * (1 + 0.6 * np.isin(days.month, [9, 11, 12])) * np.where(days.dayofweek >= 5, 0.6, 1.0)
+    return days, np.cumsum(weights) / weights.sum()
+
+
+def generate_chunks(n_rows, chunk_rows=1_000_000, seed=0, start='2019-01-01', years=4):
+    """Yield the dataset as consecutive, date-sorted chunks of at most ``chunk_rows`` rows."""
+    root = np.random.SeedSequence(seed)
+    vocab_seed, *chunk_seeds = root.spawn(1 + max(1, -(-n_rows // chunk_rows)))
+    vocab = _Vocabulary(n_rows, np.random.default_rng(vocab_seed))
+    days, cdf = _day_cdf(start, years)
+
+    for index, chunk_seed in enumerate(chunk_seeds):
+        lo, hi = index * chunk_rows, min(n_rows, (index + 1) * chunk_rows)
+        if lo >= hi:
+            break
+        rng = np.random.default_rng(chunk_seed)
+        n = hi - lo
+        # Each chunk covers its share of the cumulative order volume, so chunks are in date order
+        u = np.sort(rng.uniform(lo / n_rows, hi / n_rows, size=n))
+        order_date = days[np.minimum(np.searchsorted(cdf, u), len(days) - 1)]
+        ship_date = order_date + pd.to_timedelta(rng.choice(8, size=n, p=[0.05, 0.04, 0.13, 0.1, 0.28, 0.22, 0.12, 0.06]),
+                                                 unit='D')
+
+        customer = rng.choice(len(vocab.customers), size=n, p=vocab.customer_weights)
+        product = rng.choice(len(vocab.products), size=n, p=vocab.product_weights)
+        sub = vocab.product_sub[product]
+        region = rng.choice(len(vocab.regions), size=n, p=vocab.region_weights)
+        state = np.empty(n, dtype=object)
+        city = np.empty(n, dtype=object)
+        zip_code = np.empty(n, dtype=np.int64)
+        for r in range(len(vocab.regions)):
+            rows = np.flatnonzero(region == r)
+            picked = vocab.states[r][rng.choice(len(vocab.states[r]), size=len(rows), p=vocab.state_weights[r])]
+            state[rows] = picked
+            which = rng.integers(12, size=len(rows))
+            for name in np.unique(picked):
+                mask = picked == name
+                city[rows[mask]] = vocab.cities[name][which[mask]]
+                zip_code[rows[mask]] = vocab.zips[name][which[mask]]
+
+        quantity = rng.choice(QUANTITIES[0], size=n, p=QUANTITIES[1])
+        discount = rng.choice(DISCOUNTS[0], size=n, p=DISCOUNTS[1])
+        sales = np.round(vocab.product_price[product] * quantity * (1 - discount), 3)
+        margin = np.clip(vocab.base_margin[sub] - 1.1 * discount + rng.normal(0, 0.08, size=n), -2.75, 0.5)
+        profit = np.round(sales * margin, 4)
+        with np.errstate(invalid='ignore', divide='ignore'):
+            profit_margin = np.round(np.where(sales > 0, profit / sales, 0.0), 4)
+
+        # About two lines per order
+        order_number = 100_000 + (lo + np.arange(n)) // 2
+        order_id = pd.Series(order_date.year.astype(str), dtype=object) + '-' + pd.Series(order_number.astype(str))
+        yield pd.DataFrame({
+            'order_id': 'US-' + order_id,
+            'order_date': order_date,
+            'ship_date': ship_date,
+            'customer': vocab.customers[customer],
+            'manufactory': np.array(MANUFACTURERS, dtype=object)[vocab.product_maker[product]],
+            'product_name': vocab.products[product],
+            'segment': np.array(SEGMENTS[0], dtype=object)[vocab.customer_segment[customer]],
+            'category': vocab.categories[sub],
+            'subcategory': vocab.subcategories[sub],
+            'region': vocab.regions[region],
+            'zip': zip_code,
+            'city': city,
+            'state': state,
+            'country': 'United States',
+            'discount': discount,
+            'profit': profit,
+            'quantity': quantity,
+            'sales': sales,
+            'profit_margin': profit_margin,
+        })
+
+
+def generate(n_rows, seed=0, **kwargs):
+    """The whole synthetic dataset as one frame."""
+    return pd.concat(generate_chunks(n_rows, seed=seed, **kwargs), ignore_index=True)
+
+
+def write(path, n_rows, seed=0, chunk_rows=1_000_000):
+    """Write a synthetic dataset to ``.parquet``, ``.csv`` or ``.xlsx``, chunk by chunk where possible."""
+    chunks = generate_chunks(n_rows, chunk_rows=chunk_rows, seed=seed)
+    if path.endswith('.parquet'):
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+
+        writer = None
+        try:
+            for chunk in chunks:
+                table = pa.Table.from_pandas(chunk, preserve_index=False)
+                if writer is None:
+                    writer = pq.ParquetWriter(path, table.schema)
+                writer.write_table(table)
+        finally:
+            if writer is not None:
+                writer.close()
+    elif path.endswith('.csv'):
+        for i, chunk in enumerate(chunks):
+            chunk.to_csv(path, mode='w' if i == 0 else 'a', header=i == 0, index=False)
+    elif path.endswith('.xlsx'):
+        if n_rows > 1_048_575:
+            raise ValueError("an Excel sheet holds at most 1,048,575 data rows")
+        pd.concat(chunks, ignore_index=True).to_excel(path, index=False, engine='openpyxl')
+    else:
+        raise ValueError(f"unsupported output format: {path}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Generate synthetic Superstore orders.")
+    parser.add_argument('rows', help="row count, e.g. 10k, 1M, 10M, 50M")
+    parser.add_argument('output', help="output file (.parquet, .csv or .xlsx)")
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--chunk-rows', type=int, default=1_000_000)
+    args = parser.parse_args(argv)
+    write(args.output, parse_size(args.rows), seed=args.seed, chunk_rows=args.chunk_rows)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
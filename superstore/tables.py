@@ -0,0 +1,108 @@
+"""Server-side pagination, sorting and chunked export of result tables.
+
+A :class:`PagedTable` wraps a result frame without copying it. Sorting
+computes the row order once (a stable argsort of one column) and paging
+takes only the rows of the visible page, so the browser never receives more
+than one page of a long table. Exports walk the same order in chunks and
+write each chunk to CSV or Parquet as it is produced, so only one chunk is
+converted at a time; :func:`export_bytes` still returns the whole file,
+since that is what a download button serves.
+"""
+import pandas as pd
+
+# Rows per page of an on-screen table
+PAGE_SIZE = 50
+
+# Rows converted and written per export chunk
+EXPORT_CHUNK_ROWS = 50_000
+
+EXPORT_FORMATS = {'csv': 'text/csv', 'parquet': 'application/vnd.apache.parquet'}
+
+
+class PagedTable:
+    """A result frame served one page (or one export chunk) at a time."""
+
+    def __init__(self, frame, columns=None):
+        self.frame = frame
+        self.columns = list(frame.columns) if columns is None else list(columns)
+        self._column_positions = [frame.columns.get_loc(column) for column in self.columns]
+        self._orders = {}
+
+    def __len__(self):
+        return len(self.frame)
+
+    def page_count(self, page_size=PAGE_SIZE):
+        return max(1, -(-len(self.frame) // page_size))
+
+    def order(self, by=None, ascending=True):
+        """Row positions in ``by`` order (ties keep their order, missing values last); ``None`` keeps the frame's order."""
+        if by is None:
+            return None
+        if (by, ascending) not in self._orders:
+            values = self.frame[by].reset_index(drop=True)
+            self._orders[by, ascending] = values.sort_values(ascending=ascending, kind='stable',
+                                                             na_position='last').index.to_numpy()
+        return self._orders[by, ascending]
+
+    def _take(self, lo, hi, order):
+        rows = slice(lo, hi) if order is None else order[lo:hi]
+        return self.frame.iloc[rows, self._column_positions]
+
+    def page(self, number, page_size=PAGE_SIZE, by=None, ascending=True):
+        """Rows of page ``number`` (counted from 0, clamped to the last page)."""
+        number = min(max(number, 0), self.page_count(page_size) - 1)
+        return self._take(number * page_size, (number + 1) * page_size, self.order(by, ascending))
+
+    def iter_chunks(self, chunk_rows=EXPORT_CHUNK_ROWS, by=None, ascending=True):
+        """Yield the selected columns in order as frames of at most ``chunk_rows`` rows."""
+        order = self.order(by, ascending)
+        for lo in range(0, len(self.frame), chunk_rows):
+            yield self._take(lo, lo + chunk_rows, order)
+
+    def write_csv(self, target, chunk_rows=EXPORT_CHUNK_ROWS, by=None, ascending=True):
+        """Write the table as CSV to a path or binary file object, one chunk at a time."""
+        fh = open(target, 'wb') if isinstance(target, str) else target
+        try:
+            fh.write((pd.DataFrame(columns=self.columns).to_csv(index=False)).encode())
+            for chunk in self.iter_chunks(chunk_rows, by, ascending):
+                fh.write(chunk.to_csv(header=False, index=False).encode())
+        finally:
+            if fh is not target:
+                fh.close()
+
+    def write_parquet(self, target, chunk_rows=EXPORT_CHUNK_ROWS, by=None, ascending=True):
+        """Write the table as Parquet to a path or binary file object, one row group per chunk."""
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+
+        writer = None
+        try:
+            for chunk in self.iter_chunks(chunk_rows, by, ascending):
+                table = pa.Table.from_pandas(chunk, preserve_index=False)
+                if writer is None:
+                    writer = pq.ParquetWriter(target, table.schema)
+                writer.write_table(table.cast(writer.schema))
+            if writer is None:
+                empty = pa.Table.from_pandas(self.frame.iloc[:0, self._column_positions], preserve_index=False)
+                writer = pq.ParquetWriter(target, empty.schema)
+                writer.write_table(empty)
+        finally:
+            if writer is not None:
+                writer.close()
+
+    def export(self, fmt, target, chunk_rows=EXPORT_CHUNK_ROWS, by=None, ascending=True):
+        """Write the table as ``fmt`` (``'csv'`` or ``'parquet'``) to ``target``."""
+        if fmt not in EXPORT_FORMATS:
+            raise ValueError(f"unsupported export format: {fmt!r}; expected one of {', '.join(EXPORT_FORMATS)}")
+        write = self.write_csv if fmt == 'csv' else self.write_parquet
+        write(target, chunk_rows, by, ascending)
+
+
+def export_bytes(table, fmt, by=None, ascending=True):
+    """Export ``table`` through a temporary file, closed before its contents are returned."""
+    import tempfile
+
+    with tempfile.TemporaryFile() as fh:
+        table.export(fmt, fh, by=by, ascending=ascending)
+        fh.seek(0)
+        return fh.read()
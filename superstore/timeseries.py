@@ -0,0 +1,132 @@
+"""Multi-resolution time-series rollups for Sales Trends by Seasonality.
+
+:class:`TimeSeriesStore` is derived from the sales :class:`~superstore.cube.Cube`
+(never from order rows). It holds a dense day x region x category x measure
+array over the dataset's full calendar, with days without orders as zeros,
+and precomputed ISO-week, month and quarter rollups of it. A query selects a
+region and category by indexing and sums the periods of a date range with
+``np.add.reduceat``, so its cost depends on the number of days in the range,
+not on the number of orders.
+
+Periods are labelled by their first day (weeks start on Monday). When a
+date range starts or ends inside a period, that period only sums the days
+inside the range.
+"""
+import numpy as np
+import pandas as pd
+
+from superstore.index import date_bounds
+
+RESOLUTIONS = ['day', 'week', 'month', 'quarter']
+MEASURES = ['sales', 'profit', 'quantity']
+
+
+def period_starts(days, resolution):
+    """First day of the ``resolution`` period containing each of ``days``."""
+    days = pd.DatetimeIndex(days)
+    if resolution == 'day':
+        return days
+    if resolution == 'week':
+        return days - pd.to_timedelta(days.dayofweek, unit='D')
+    if resolution == 'month':
+        return days.to_period('M').to_timestamp()
+    if resolution == 'quarter':
+        return days.to_period('Q').to_timestamp()
+    raise ValueError(f"unknown resolution {resolution!r}; expected one of {', '.join(RESOLUTIONS)}")
+
+
+def _boundaries(days, resolution):
+    # Positions in ``days`` where a new period starts
+    starts = period_starts(days, resolution).to_numpy()
+    return np.flatnonzero(np.r_[True, starts[1:] != starts[:-1]]) if len(starts) else np.array([], dtype=np.int64)
+
+
+def rolling_mean(values, window):
+    """Trailing mean over ``window`` periods, NaN until the window is full (like ``Series.rolling(window).mean()``)."""
+    values = np.asarray(values, dtype=float)
+    out = np.full(len(values), np.nan)
+    if window < 1 or len(values) < window:
+        return out
+    sums = np.cumsum(np.r_[0.0, values])
+    out[window - 1:] = (sums[window:] - sums[:-window]) / window
+    return out
+
+
+def year_position(periods, resolution):
+    """``(year, position within the year)`` of each period label, for year-over-year overlays.
+
+    Positions are the day of the year, the ISO week, the month or the
+    quarter; weeks use the ISO year they belong to.
+    """
+    periods = pd.DatetimeIndex(periods)
+    if resolution == 'week':
+        iso = periods.isocalendar()
+        return iso['year'].to_numpy(dtype=np.int64), iso['week'].to_numpy(dtype=np.int64)
+    position = {'day': periods.dayofyear, 'month': periods.month, 'quarter': periods.quarter}[resolution]
+    return periods.year.to_numpy(dtype=np.int64), np.asarray(position, dtype=np.int64)
+
+
+class TimeSeriesStore:
+    """Dense day x region x category rollups plus their week, month and quarter aggregates."""
+
+    def __init__(self, days, regions, categories, values):
+        self.days = pd.DatetimeIndex(days)
+        self.regions = list(regions)
+        self.categories = list(categories)
+        self._day_numbers = self.days.to_numpy()
+        self.periods = {}
+        self.rollups = {}
+        for resolution in RESOLUTIONS:
+            starts = _boundaries(self.days, resolution)
+            self.periods[resolution] = period_starts(self.days[starts], resolution)
+            self.rollups[resolution] = values if resolution == 'day' else np.add.reduceat(values, starts, axis=0)
+
+    @classmethod
+    def from_cube(cls, cube):
+        """Roll the cube up to day x region x category and lay it out on a continuous calendar."""
+        cells = cube.rollup(['order_date', 'region', 'category'], MEASURES)
+        if len(cells) == 0:
+            return cls(pd.DatetimeIndex([]), [], [], np.zeros((0, 0, 0, len(MEASURES))))
+        # Cells may still carry a time of day (e.g. a cube read from an older store), so floor them
+        dates = cells['order_date'].dt.normalize()
+        days = pd.date_range(dates.iloc[0], dates.iloc[-1], freq='D')
+        regions = sorted(cells['region'].unique())
+        categories = sorted(cells['category'].unique())
+        values = np.zeros((len(days), len(regions), len(categories), len(MEASURES)))
+        day = ((dates - days[0]) // pd.Timedelta(days=1)).to_numpy()
+        region = pd.Categorical(cells['region'], categories=regions).codes
+        category = pd.Categorical(cells['category'], categories=categories).codes
+        # Several cells can fall on the same day, so accumulate rather than assign
+        np.add.at(values, (day, region, category), cells[MEASURES].to_numpy(dtype=float))
+        return cls(days, regions, categories, values)
+
+    def __len__(self):
+        return len(self.days)
+
+    def _select(self, values, measure, region, category):
+        # Reduce a (periods, regions, categories, measures) array to one series
+        values = values[..., MEASURES.index(measure)]
+        for axis, labels, value in ((1, self.regions, region), (2, self.categories, category)):
+            if value is None:
+                continue
+            if value not in labels:
+                return np.zeros(len(values))
+            values = values.take([labels.index(value)], axis=axis)
+        return values.sum(axis=(1, 2))
+
+    def series(self, resolution='month', measure='sales', start=None, end=None, region=None, category=None):
+        """``measure`` per ``resolution`` period for the filter, as a frame with ``period`` and ``measure`` columns."""
+        if resolution not in RESOLUTIONS:
+            raise ValueError(f"unknown resolution {resolution!r}; expected one of {', '.join(RESOLUTIONS)}")
+        lo, hi = date_bounds(self._day_numbers, start, end)
+        if hi == lo:
+            return pd.DataFrame({'period': pd.DatetimeIndex([]), measure: np.array([], dtype=float)})
+        if lo == 0 and hi == len(self.days):
+            periods, values = self.periods[resolution], self.rollups[resolution]
+        else:
+            # Partial range: re-aggregate the days inside it (the first period may start before ``start``)
+            days = self.days[lo:hi]
+            starts = _boundaries(days, resolution)
+            periods = period_starts(days[starts], resolution)
+            values = np.add.reduceat(self.rollups['day'][lo:hi], starts, axis=0)
+        return pd.DataFrame({'period': periods, measure: self._select(values, measure, region, category)})
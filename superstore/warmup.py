@@ -0,0 +1,196 @@
+"""Background warm-up of every page's default view.
+
+As soon as a dataset is loaded, :class:`WarmupScheduler` computes what each
+page needs for its default filters (the cube, the customer and product
+indexes, the per-filter product totals, the time-series rollups, the
+correlation cells, ...) on a thread pool, in the order the pages appear in
+the sidebar. Everything is memoized on the shared dataset, so a page opened
+afterwards only does cheap lookups on its first render.
+
+Each dataset is warmed once, however many sessions use it. When a session
+switches to another dataset, the warm-up of the one it left is cancelled,
+unless another session still uses it: queued pages are dropped and a page
+that is already running stops at its next step. Work on a page the user is
+currently viewing is never wasted, since it fills the same caches.
+"""
+import datetime
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from superstore import analytics
+
+# Date range preselected on the Customer Sales Analytics and Product Performance pages
+DEFAULT_RANGE = (datetime.date(2019, 1, 1), datetime.date(2020, 12, 31))
+
+# Products listed by default on Product Performance
+DEFAULT_TOP_K = 5
+
+# A session that has not rerun for this long is assumed closed and no longer holds its dataset
+SESSION_TTL_SECONDS = 3600
+
+
+class Cancelled(Exception):
+    """Raised inside a warm-up task once its dataset is no longer wanted."""
+
+
+def _full_range(dataset):
+    return dataset.dates.min_date.date(), dataset.dates.max_date.date()
+
+
+def warm_regional(dataset, check):
+    analytics.sales_by_region(dataset)
+    check()
+    analytics.margin_by_region(dataset)
+
+
+def warm_category(dataset, check):
+    start, end = _full_range(dataset)
+    analytics.category_sales(dataset, dataset.distinct('category')[0], start, end)
+
+
+def warm_customers(dataset, check):
+    analytics.top_customers(dataset, 5, 'profit')
+    check()
+    analytics.distinct_count(dataset, 'customer', *DEFAULT_RANGE)
+    check()
+    customers = analytics.customers_between(dataset, *DEFAULT_RANGE)
+    check()
+    if customers:
+        analytics.customer_purchases(dataset, customers[0], *DEFAULT_RANGE)
+
+
+def warm_profit(dataset, check):
+    start, end = _full_range(dataset)
+    analytics.total_profit(dataset)
+    analytics.regions_between(dataset, start, end)
+    analytics.categories_between(dataset, start, end)
+    check()
+    analytics.profit_by_region(dataset, start, end)
+    analytics.profit_by_subcategory(dataset, start, end)
+
+
+def warm_discount(dataset, check):
+    dataset.distinct('region')
+    analytics.discount_impact(dataset)
+
+
+def warm_products(dataset, check):
+    analytics.ranked_products(dataset, DEFAULT_TOP_K, *DEFAULT_RANGE)
+
+
+def warm_states(dataset, check):
+    start, end = _full_range(dataset)
+    analytics.quantity_by_state(dataset, start, end)
+
+
+def warm_seasonality(dataset, check):
+    start, end = _full_range(dataset)
+    analytics.sales_trend(dataset, 'month', 'sales', start, end, window=3)
+    analytics.seasonality(dataset, 'month', 'sales', start, end)
+
+
+def warm_correlation(dataset, check):
+    start, end = _full_range(dataset)
+    analytics.correlation_matrix(dataset, start, end)
+
+
+# Pages in priority (sidebar) order
+PAGES = [
+    ("Regional Performance Analysis", warm_regional),
+    ("Product Category Analysis", warm_category),
+    ("Customer Sales Analytics", warm_customers),
+    ("Profit Analytics", warm_profit),
+    ("Discount Strategy Analysis", warm_discount),
+    ("Product Performance", warm_products),
+    ("State-wise Performance", warm_states),
+    ("Sales Trends by Seasonality", warm_seasonality),
+    ("Correlation Analysis", warm_correlation),
+]
+
+
+class Warmup:
+    """The warm-up of one dataset: one task per page, cancellable as a whole."""
+
+    def __init__(self, dataset, executor, pages=PAGES):
+        self.dataset = dataset
+        self.status = {name: 'queued' for name, _ in pages}
+        self._cancelled = threading.Event()
+        self._futures = [executor.submit(self._run, name, warm) for name, warm in pages]
+
+    def _check(self):
+        if self._cancelled.is_set():
+            raise Cancelled()
+
+    def _run(self, name, warm):
+        if self._cancelled.is_set():
+            self.status[name] = 'cancelled'
+            return
+        self.status[name] = 'running'
+        try:
+            warm(self.dataset, self._check)
+        except Cancelled:
+            self.status[name] = 'cancelled'
+        except Exception as exc:
+            # A page that cannot be warmed is simply computed on demand, where the error surfaces
+            self.status[name] = f'failed: {exc}'
+        else:
+            self.status[name] = 'done'
+
+    def cancel(self):
+        """Drop queued pages and stop running ones at their next step."""
+        self._cancelled.set()
+        for future in self._futures:
+            future.cancel()
+        for name, state in self.status.items():
+            if state == 'queued':
+                self.status[name] = 'cancelled'
+
+    @property
+    def done(self):
+        return all(future.done() for future in self._futures)
+
+    def wait(self, timeout=None):
+        """Block until every page has finished, failed or been cancelled."""
+        for future in self._futures:
+            if not future.cancelled():
+                future.exception(timeout)
+
+
+class WarmupScheduler:
+    """Warms the datasets sessions are using, one :class:`Warmup` per dataset key."""
+
+    def __init__(self, max_workers=2, session_ttl=SESSION_TTL_SECONDS):
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='warmup')
+        self._lock = threading.Lock()
+        self.session_ttl = session_ttl
+        self.warmups = {}
+        # session -> (dataset key, time of its last warm() call)
+        self._sessions = {}
+
+    def warm(self, dataset, session=None):
+        """Start warming ``dataset`` unless it already is; returns its :class:`Warmup`.
+
+        ``session`` identifies the caller. Once no session uses a dataset any
+        more (they all switched to another one, or stopped rerunning for
+        ``session_ttl`` seconds), its warm-up is cancelled and forgotten.
+        """
+        now = time.monotonic()
+        with self._lock:
+            self._sessions[session] = (dataset.key, now)
+            for other, (_, seen) in list(self._sessions.items()):
+                if now - seen > self.session_ttl:
+                    del self._sessions[other]
+            in_use = {key for key, _ in self._sessions.values()}
+            for key in list(self.warmups):
+                if key not in in_use:
+                    self.warmups.pop(key).cancel()
+            if dataset.key not in self.warmups:
+                self.warmups[dataset.key] = Warmup(dataset, self._executor)
+            return self.warmups[dataset.key]
+
+    def shutdown(self):
+        with self._lock:
+            for warmup in self.warmups.values():
+                warmup.cancel()
+        self._executor.shutdown(wait=True)
@@ -0,0 +1,43 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+REGIONS = {'East': ['New York', 'Ohio'], 'West': ['California', 'Washington'], 'Central': ['Texas']}
+CATEGORIES = {'Furniture': ['Chairs', 'Tables'], 'Technology': ['Phones'], 'Office Supplies': ['Paper', 'Binders']}
+
+
+def make_orders(n=2000, seed=0, start='2019-01-01', days=730, times=False, customers=300, products=150):
+    """Raw Superstore-shaped orders; with ``times`` every order gets a random time of day."""
+    rng = np.random.default_rng(seed)
+    order_date = pd.Timestamp(start) + pd.to_timedelta(rng.integers(0, days, n), unit='D')
+    if times:
+        order_date = order_date + pd.to_timedelta(rng.integers(0, 86400, n), unit='s')
+    region = rng.choice(list(REGIONS), n)
+    category = rng.choice(list(CATEGORIES), n)
+    sales = rng.gamma(2.0, 100.0, n).round(2)
+    discount = rng.choice([0.0, 0.1, 0.2, 0.5], n)
+    profit = (sales * (0.3 - discount) + rng.normal(0, 10, n)).round(2)
+    return pd.DataFrame({
+        'order_date': order_date,
+        'customer': [f'Customer {i}' for i in rng.integers(0, customers, n)],
+        'product_name': [f'Product {i}' for i in rng.integers(0, products, n)],
+        'category': category,
+        'subcategory': [rng.choice(CATEGORIES[c]) for c in category],
+        'region': region,
+        'state': [rng.choice(REGIONS[r]) for r in region],
+        'discount': discount,
+        'profit': profit,
+        'quantity': rng.integers(1, 10, n),
+        'sales': sales,
+        'profit_margin': profit / sales,
+    })
+
+
+@pytest.fixture
+def orders():
+    return make_orders()
+
+
+@pytest.fixture
+def timestamped_orders():
+    return make_orders(times=True)
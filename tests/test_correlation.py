@@ -0,0 +1,36 @@
+import numpy as np
+import pandas as pd
+
+from superstore.correlation import CORRELATION_COLUMNS, CorrelationCube, Moments
+from superstore.dataset import Dataset
+
+
+def test_chunked_moments_match_dataframe_corr(orders):
+    moments = Moments.empty()
+    for rows in np.array_split(np.arange(len(orders)), 7):
+        moments.update(orders.iloc[rows])
+    halves = Moments.from_frame(orders.iloc[:500]).merge(Moments.from_frame(orders.iloc[500:]))
+
+    expected = orders[CORRELATION_COLUMNS].corr()
+    pd.testing.assert_frame_equal(moments.correlation(), expected)
+    pd.testing.assert_frame_equal(halves.correlation(), expected)
+    pd.testing.assert_frame_equal(moments.covariance(), orders[CORRELATION_COLUMNS].cov())
+
+
+def test_merged_cells_match_dataframe_corr(timestamped_orders):
+    dataset = Dataset(timestamped_orders, key='timestamped')
+    frame = dataset.frame
+    pd.testing.assert_frame_equal(dataset.correlations.correlation(), frame[CORRELATION_COLUMNS].corr())
+
+    start, end = pd.Timestamp('2019-06-01'), pd.Timestamp('2020-03-31')
+    days = frame['order_date'].dt.normalize()
+    subset = frame[(days >= start) & (days <= end) & (frame['region'] == 'East')]
+    pd.testing.assert_frame_equal(dataset.correlations.correlation(start, end, region='East'),
+                                  subset[CORRELATION_COLUMNS].corr())
+
+    # Cubes built per partition and merged hold the same cells as one built over everything
+    parts = [CorrelationCube.from_frame(frame.iloc[rows]) for rows in np.array_split(np.arange(len(frame)), 3)]
+    merged = parts[0].merge(*parts[1:])
+    assert len(merged) == len(dataset.correlations)
+    pd.testing.assert_frame_equal(merged.correlation(start, end, region='East'),
+                                  subset[CORRELATION_COLUMNS].corr())
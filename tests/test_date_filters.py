@@ -0,0 +1,64 @@
+import numpy as np
+import pandas as pd
+
+from superstore import analytics
+from superstore.dataset import Dataset
+from superstore.index import DateIndex
+from superstore.sketches import relative_error
+
+START = pd.Timestamp('2019-03-05')
+
+
+def _expected(frame, start, end):
+    # Whole calendar days, whatever the time of day of the orders
+    days = frame['order_date'].dt.normalize()
+    return frame[(days >= start) & (days <= end)]
+
+
+def test_date_index_takes_whole_days():
+    days = pd.to_datetime(['2019-01-01 08:00', '2019-01-02 00:00', '2019-01-02 23:59', '2019-01-03 00:00'])
+    dates = DateIndex(pd.DataFrame({'order_date': days}))
+    assert dates.bounds('2019-01-02', '2019-01-02') == (1, 3)
+    assert dates.bounds('2019-01-02 12:00', '2019-01-02 01:00') == (1, 3)
+    assert dates.bounds('2019-01-01', None) == (0, 4)
+    assert dates.bounds('2019-01-04', '2019-01-01') == (4, 4)
+
+
+def test_end_day_is_inclusive_on_every_path(timestamped_orders):
+    dataset = Dataset(timestamped_orders, key='timestamped')
+    # End on a day with West orders after midnight, which a timestamp comparison would drop
+    west = dataset.frame[dataset.frame['region'] == 'West']
+    end = west['order_date'].iloc[len(west) // 2].normalize()
+    expected = _expected(dataset.frame, START, end)
+    assert (west['order_date'].dt.normalize() == end).any()
+
+    rows = dataset.rows(START, end)
+    assert len(rows) == len(expected)
+    assert np.isclose(dataset.cube.total('sales', START, end), expected['sales'].sum())
+
+    subset = expected[(expected['category'] == 'Furniture') & (expected['region'] == 'West')]
+    assert np.isclose(dataset.cube.total('sales', START, end, region='West', category='Furniture'),
+                      subset['sales'].sum())
+
+    customer = expected['customer'].iloc[-1]
+    purchases = dataset.customers.rows(customer, START, end)
+    assert len(purchases) == (expected['customer'] == customer).sum()
+
+    ranked = dataset.products.rank(1000, START, end, region='West')
+    assert np.isclose(ranked['sales'].sum(), expected.loc[expected['region'] == 'West', 'sales'].sum())
+
+    trend = analytics.sales_trend(dataset, 'day', 'sales', START, end)
+    assert np.isclose(trend['sales'].sum(), expected['sales'].sum())
+
+
+def test_distinct_counts_agree_on_the_end_day(timestamped_orders):
+    dataset = Dataset(timestamped_orders, key='timestamped')
+    last = dataset.frame['order_date'].iloc[-1].normalize()
+    for start, end in ((last, last), (START, last - pd.Timedelta(days=300))):
+        exact = analytics.distinct_count(dataset, 'customer', start, end, exact=True)
+        assert exact == _expected(dataset.frame, start, end)['customer'].nunique()
+        estimate = analytics.distinct_count(dataset, 'customer', start, end)
+        assert abs(estimate - exact) <= 3 * relative_error() * exact
+    # A handful of values is counted exactly, so a dropped end day would show
+    assert analytics.distinct_count(dataset, 'customer', last, last) == \
+        analytics.distinct_count(dataset, 'customer', last, last, exact=True)
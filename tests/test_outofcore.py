@@ -0,0 +1,39 @@
+import numpy as np
+import pandas as pd
+from conftest import make_orders
+
+from superstore import analytics
+from superstore.dataset import Dataset
+from superstore.outofcore import append_store, build_store, open_store
+
+
+def _assert_reports_equal(actual, expected):
+    assert actual.keys() == expected.keys()
+    for name in expected:
+        pd.testing.assert_frame_equal(actual[name], expected[name], check_dtype=False, check_categorical=False,
+                                      obj=name)
+
+
+def test_overlapping_appends_match_an_in_memory_build(tmp_path):
+    orders = make_orders(n=6000).sort_values('order_date', kind='stable', ignore_index=True)
+    # The second file repeats the last months of the first, as a re-export would
+    first, second = orders.iloc[:4000], orders.iloc[3000:]
+    first.to_csv(tmp_path / 'first.csv', index=False)
+    second.to_csv(tmp_path / 'second.csv', index=False)
+    root = str(tmp_path / 'store')
+
+    build_store(str(tmp_path / 'first.csv'), root, budget='2MB')
+    appended = append_store(str(tmp_path / 'second.csv'), root, budget='2MB')
+    # The same rows under another name are all found in the store and skipped
+    again = append_store(str(tmp_path / 'second.csv'), root, budget='2MB', key='second-again')
+
+    expected = Dataset(orders, key='orders')
+    assert len(appended) == len(again) == len(expected)
+    _assert_reports_equal(analytics.default_reports(open_store(root)), analytics.default_reports(expected))
+
+    start, end = pd.Timestamp('2019-11-01'), pd.Timestamp('2020-02-15')
+    for column in ('customer', 'product_name'):
+        assert again.count_distinct(column, start, end) == expected.count_distinct(column, start, end)
+        assert np.isclose(analytics.distinct_count(again, column, start, end),
+                          analytics.distinct_count(expected, column, start, end))
+    assert analytics.customers_between(again, start, end) == analytics.customers_between(expected, start, end)
@@ -0,0 +1,35 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from superstore.dataset import Dataset
+from superstore.sketches import (PRECISION, build_sketches, cell_ranks, estimate, hash_values, merge_cell_ranks,
+                                 registers_and_ranks, relative_error)
+
+
+@pytest.mark.parametrize('cardinality', [0, 1, 40, 3_000, 60_000, 400_000])
+def test_estimate_is_within_the_error_bound(cardinality):
+    values = pd.Series(np.arange(cardinality)).astype(str).repeat(2)
+    registers, ranks = registers_and_ranks(hash_values(values)[0])
+    sketch = np.zeros(2 ** PRECISION, dtype=np.uint8)
+    np.maximum.at(sketch, registers, ranks)
+    # Three standard errors; small counts come out exact
+    tolerance = max(3 * relative_error() * cardinality, 0.5)
+    assert abs(estimate(sketch) - cardinality) <= tolerance
+
+
+def test_merged_chunks_match_a_single_build(timestamped_orders):
+    dataset = Dataset(timestamped_orders, key='timestamped')
+    frame, timeseries = dataset.frame, dataset.timeseries
+    chunks = [frame.iloc[rows] for rows in np.array_split(np.arange(len(frame)), 5)]
+
+    whole = cell_ranks(frame, 'customer')
+    merged = merge_cell_ranks([cell_ranks(chunk, 'customer') for chunk in chunks])
+    pd.testing.assert_frame_equal(merged, whole, check_categorical=False)
+
+    stores = build_sketches(chunks, timeseries.days, timeseries.regions, timeseries.categories)
+    for column, store in dataset.sketches.items():
+        for start, end, region in ((None, None, None), ('2019-02-10', '2020-07-03', 'West'),
+                                   ('2020-01-31', '2020-01-31', None)):
+            np.testing.assert_array_equal(stores[column].registers(start, end, region),
+                                          store.registers(start, end, region))
@@ -0,0 +1,32 @@
+import pandas as pd
+
+from superstore import analytics
+from superstore.dataset import Dataset
+from superstore.warmup import DEFAULT_RANGE, WarmupScheduler, warm_customers
+
+
+def test_app_dates_hit_the_warmed_customer_list(orders):
+    dataset = Dataset(orders, key='orders')
+    warm_customers(dataset, lambda: None)
+    warmed = dataset.customers._between.cache_info()
+
+    # The Customer page passes the date inputs through pd.to_datetime
+    start, end = (pd.to_datetime(day) for day in DEFAULT_RANGE)
+    customers = analytics.customers_between(dataset, start, end)
+
+    info = dataset.customers._between.cache_info()
+    assert info.hits == warmed.hits + 1
+    assert info.misses == warmed.misses
+    assert customers == analytics.customers_between(dataset, '2019-01-01', '2020-12-31')
+
+
+def test_scheduler_warms_each_dataset_once(orders):
+    dataset = Dataset(orders, key='orders')
+    scheduler = WarmupScheduler()
+    try:
+        warmup = scheduler.warm(dataset, session='a')
+        assert scheduler.warm(dataset, session='b') is warmup
+        warmup.wait(timeout=60)
+        assert set(warmup.status.values()) == {'done'}
+    finally:
+        scheduler.shutdown()